@@ -0,0 +1,240 @@
+"""Storage backends behind the API routes.
+
+create_app() picks one backend per app with init_app(); routes fetch it with
+get_backend() and never branch on the storage engine themselves.
+
+    memory  app.store, the in-process dict store (default on Vercel or with
+            USE_IN_MEMORY_STORE=1)
+    mysql   MySQL through app.database (the default otherwise)
+    sqlite  a single SQLite file in WAL mode (STORAGE_BACKEND=sqlite)
+
+The SQL backends get a product read cache in front of them (see
+app.backends.cached; CATALOG_CACHE=off|local|redis).
+
+Rows are returned as plain dicts in the same shape for every backend. Memory
+rows are shared and read-only, so callers build new dicts instead of
+mutating them.
+"""
+import os
+import sqlite3
+
+from flask import current_app
+from mysql.connector import Error as MySQLError
+
+from app.store import OrderError, is_memory_mode
+
+# Errors a backend may raise for a failed storage operation; routes answer
+# them with a 500. app.pool.PoolTimeout (no free connection) is not one of
+# them: create_app answers it with a 503.
+STORAGE_ERRORS = (MySQLError, sqlite3.Error)
+
+BACKEND_NAMES = ('memory', 'mysql', 'sqlite')
+
+# Columns a client may ask for with ?fields=; product_id is always included.
+PRODUCT_FIELDS = ('product_id', 'name', 'description', 'price', 'image_url', 'stock', 'category', 'created_at')
+
+_EXTENSION_KEY = 'elitecart.backend'
+
+
+class Backend:
+    """What the routes need from storage. Every backend implements all of it."""
+
+    name = None
+
+    def init_app(self, app):
+        """Hook for per-app setup such as request teardown."""
+
+    def stats(self):
+        """Backend-specific health information for /api/health/store."""
+        return {}
+
+    # Users
+
+    def find_user_by_email(self, email):
+        raise NotImplementedError
+
+    def create_user(self, name, email, password_hash):
+        """Store a user and return the row (with user_id)."""
+        raise NotImplementedError
+
+    # Products
+
+    def catalog_version(self):
+        """(version tag, last change in epoch seconds) of the whole catalog.
+
+        The tag changes after every product create, update, delete and stock
+        change, so it can validate cached listings. It is read from the same
+        source as the request's product reads (the same replica, or the
+        primary), before them, so a response may pair an older tag with newer
+        rows (costing a refetch) but never the reverse. None when unavailable.
+        """
+        return None
+
+    def list_products(self, category=None, min_price=None, max_price=None, in_stock=False,
+                      limit=None, after_id=None, fields=None):
+        """Matching products newest first; with limit/after_id, one keyset page.
+
+        Without a limit the result may be a lazy iterable, meant to be
+        streamed rather than collected. fields (a tuple from PRODUCT_FIELDS,
+        including product_id) limits the columns read and returned.
+        """
+        raise NotImplementedError
+
+    def search_products(self, query, limit=20):
+        """Up to limit products matching any word of query, most relevant first."""
+        raise NotImplementedError
+
+    def get_product(self, product_id, fields=None):
+        """The product (just fields, if given), or None."""
+        raise NotImplementedError
+
+    def get_products(self, product_ids, fields=None):
+        """{product_id: product} for those of product_ids that exist, in one lookup."""
+        raise NotImplementedError
+
+    def create_product(self, data):
+        """Store a product and return its id."""
+        raise NotImplementedError
+
+    def create_products(self, rows):
+        """Store many products in one batch (one transaction or lock); returns how many."""
+        raise NotImplementedError
+
+    def update_product(self, product_id, updates):
+        """Apply updates; returns False if the product doesn't exist."""
+        raise NotImplementedError
+
+    def delete_product(self, product_id):
+        """Returns False if the product doesn't exist."""
+        raise NotImplementedError
+
+    # Orders
+
+    def place_order(self, user_id, items):
+        """Validate, price and record an order and take its stock, atomically.
+
+        Returns the order with 'items'; raises OrderError and changes nothing
+        if a product is missing or short.
+        """
+        raise NotImplementedError
+
+    def get_orders_by_user(self, user_id, limit=None, after_id=None):
+        """A user's orders newest first, each with 'items'."""
+        raise NotImplementedError
+
+    def get_order(self, order_id):
+        """The order with 'items', or None."""
+        raise NotImplementedError
+
+
+def product_columns(fields):
+    """The SELECT column list for fields; they come from PRODUCT_FIELDS, so are safe to inline."""
+    return ', '.join(fields) if fields else '*'
+
+
+def product_list_query(placeholder, category, min_price, max_price, in_stock, after_id, limit, fields=None):
+    """SELECT and params for Backend.list_products in SQL backends."""
+    query = f'SELECT {product_columns(fields)} FROM products WHERE 1=1'
+    params = []
+
+    if category:
+        query += f' AND category = {placeholder}'
+        params.append(category)
+
+    if min_price is not None:
+        query += f' AND price >= {placeholder}'
+        params.append(min_price)
+
+    if max_price is not None:
+        query += f' AND price <= {placeholder}'
+        params.append(max_price)
+
+    if in_stock:
+        query += ' AND stock > 0'
+
+    if after_id is not None:
+        query += f' AND product_id < {placeholder}'
+        params.append(after_id)
+
+    # Newest first by primary key: matches memory mode, and an unfiltered
+    # listing walks the clustered index instead of a filesort on created_at.
+    # Keyset paging seeks on the same key, so no OFFSET scan is needed.
+    query += ' ORDER BY product_id DESC'
+
+    if limit:
+        query += f' LIMIT {placeholder}'
+        params.append(limit)
+
+    return query, params
+
+
+def product_ids_query(placeholder, product_ids, fields=None):
+    """SELECT and params for Backend.get_products in SQL backends: one IN list on the primary key."""
+    placeholders = ', '.join([placeholder] * len(product_ids))
+    return f'SELECT {product_columns(fields)} FROM products WHERE product_id IN ({placeholders})', list(product_ids)
+
+
+def default_backend_name():
+    name = os.getenv('STORAGE_BACKEND')
+    if name:
+        return name.strip().lower()
+    return 'memory' if is_memory_mode() else 'mysql'
+
+
+def create_backend(name=None):
+    name = name or default_backend_name()
+    if name == 'memory':
+        from app.backends.memory import MemoryBackend
+        return MemoryBackend()
+    if name == 'mysql':
+        from app.backends.mysql import MySQLBackend
+        return MySQLBackend()
+    if name == 'sqlite':
+        from app.backends.sqlite import SQLiteBackend
+        return SQLiteBackend(os.getenv('SQLITE_PATH', 'elitecart.db'))
+    raise ValueError(f"Unknown STORAGE_BACKEND '{name}' (expected one of {', '.join(BACKEND_NAMES)})")
+
+
+def create_cache(backend_name):
+    """The CatalogCache configured by CATALOG_CACHE*, or None.
+
+    Off by default for the memory backend, whose reads are already
+    in-process dict lookups.
+    """
+    from app.cache import CatalogCache, LocalCacheStore, RedisCacheStore
+
+    mode = os.getenv('CATALOG_CACHE', 'off' if backend_name == 'memory' else 'local').strip().lower()
+    ttl = float(os.getenv('CATALOG_CACHE_TTL', 30))
+    if mode == 'off':
+        return None
+    if mode == 'local':
+        store = LocalCacheStore(int(os.getenv('CATALOG_CACHE_SIZE', 2048)), ttl)
+    elif mode == 'redis':
+        store = RedisCacheStore(os.getenv('CATALOG_CACHE_REDIS_URL', 'redis://localhost:6379/0'), ttl)
+    else:
+        raise ValueError(f"Unknown CATALOG_CACHE '{mode}' (expected off, local or redis)")
+
+    # With read replicas, a refill right after a write could read the old row
+    # back, so wait out the same window reads stick to the primary for.
+    fill_delay = 0.0
+    if backend_name == 'mysql' and os.getenv('DB_REPLICAS'):
+        fill_delay = float(os.getenv('DB_READ_YOUR_WRITES_SECONDS', 5))
+    return CatalogCache(store, fill_delay)
+
+
+def init_app(app, backend=None):
+    """Attach a backend (an instance or a name; default from the environment) to app."""
+    if backend is None or isinstance(backend, str):
+        backend = create_backend(backend)
+        cache = create_cache(backend.name)
+        if cache is not None:
+            from app.backends.cached import CachedBackend
+            backend = CachedBackend(backend, cache)
+    backend.init_app(app)
+    app.extensions[_EXTENSION_KEY] = backend
+    return backend
+
+
+def get_backend():
+    return current_app.extensions[_EXTENSION_KEY]
+
@@ -0,0 +1,131 @@
+"""A Backend that serves product reads from app.cache in front of another one.
+
+backends.init_app() puts it in front of the SQL backends unless
+CATALOG_CACHE=off. Only single products and keyset pages are cached; batch
+lookups are served from the single-product entries. Search, streamed full
+listings, users and orders go straight through. Every product write and
+every placed order goes through here too, so this process never serves a
+row it changed itself. Entries are only reused under the catalog version
+they were filled at; without a version nothing is cached.
+"""
+from app.backends import Backend
+from app.cache import page_key, page_meta, product_key
+
+
+class CachedBackend(Backend):
+    def __init__(self, inner, cache):
+        self.inner = inner
+        self.cache = cache
+
+    @property
+    def name(self):
+        return self.inner.name
+
+    def init_app(self, app):
+        self.inner.init_app(app)
+
+    def stats(self):
+        return {**self.inner.stats(), 'cache': self.cache.stats()}
+
+    def _version(self):
+        # Read before any fill, from where the fill will read: an entry is
+        # never stamped with a version newer than its rows.
+        state = self.inner.catalog_version()
+        return state[0] if state is not None else None
+
+    def find_user_by_email(self, email):
+        return self.inner.find_user_by_email(email)
+
+    def create_user(self, name, email, password_hash):
+        return self.inner.create_user(name, email, password_hash)
+
+    def list_products(self, category=None, min_price=None, max_price=None, in_stock=False,
+                      limit=None, after_id=None, fields=None):
+        version = self._version() if limit else None
+        if version is None:
+            return self.inner.list_products(category, min_price, max_price, in_stock, limit, after_id, fields)
+
+        key = page_key(category, min_price, max_price, in_stock, limit, after_id, fields)
+        rows = self.cache.get(key, version)
+        if rows is not None:
+            return rows
+        generation = self.cache.generation()
+        rows = list(self.inner.list_products(category, min_price, max_price, in_stock, limit, after_id, fields))
+        meta = page_meta(category, min_price, max_price, in_stock, limit, after_id, rows)
+        self.cache.put_page(key, rows, meta, generation, version)
+        return rows
+
+    def search_products(self, query, limit=20):
+        return self.inner.search_products(query, limit)
+
+    def catalog_version(self):
+        # The inner backend reads it at most once per request, so the ETag
+        # check and the stamps on this request's cache lookups share it.
+        return self.inner.catalog_version()
+
+    def get_product(self, product_id, fields=None):
+        version = self._version()
+        if version is None:
+            return self.inner.get_product(product_id, fields)
+        # Whole rows are cached, so any fieldset is served from one entry.
+        product = self.cache.get(product_key(product_id), version)
+        if product is None:
+            generation = self.cache.generation()
+            product = self.inner.get_product(product_id)
+            if product is None:
+                return None
+            self.cache.put_product(product_id, product, generation, version)
+        if fields:
+            return {field: product[field] for field in fields}
+        return product
+
+    def get_products(self, product_ids, fields=None):
+        version = self._version()
+        if version is None:
+            return self.inner.get_products(product_ids, fields)
+        product_ids = list(dict.fromkeys(product_ids))
+        cached = self.cache.get_many([product_key(product_id) for product_id in product_ids], version)
+        products = {product_id: row for product_id, row in zip(product_ids, cached) if row is not None}
+        missing = [product_id for product_id in product_ids if product_id not in products]
+        if missing:
+            # Everything not cached comes from one lookup in the inner backend.
+            generation = self.cache.generation()
+            for product_id, row in self.inner.get_products(missing).items():
+                self.cache.put_product(product_id, row, generation, version)
+                products[product_id] = row
+        if fields:
+            return {pid: {field: row[field] for field in fields} for pid, row in products.items()}
+        return products
+
+    def create_product(self, data):
+        product_id = self.inner.create_product(data)
+        self.cache.invalidate_product(product_id, self.inner.get_product(product_id))
+        return product_id
+
+    def create_products(self, rows):
+        created = self.inner.create_products(rows)
+        self.cache.invalidate_listings()
+        return created
+
+    def update_product(self, product_id, updates):
+        if not self.inner.update_product(product_id, updates):
+            return False
+        self.cache.invalidate_product(product_id, self.inner.get_product(product_id))
+        return True
+
+    def delete_product(self, product_id):
+        if not self.inner.delete_product(product_id):
+            return False
+        self.cache.invalidate_product(product_id, None)
+        return True
+
+    def place_order(self, user_id, items):
+        order = self.inner.place_order(user_id, items)
+        self.cache.invalidate_stock({item['product_id'] for item in order['items']})
+        return order
+
+    def get_orders_by_user(self, user_id, limit=None, after_id=None):
+        return self.inner.get_orders_by_user(user_id, limit, after_id)
+
+    def get_order(self, order_id):
+        return self.inner.get_order(order_id)
@@ -0,0 +1,59 @@
+"""Backend over app.store, the in-process dict store."""
+from app import store
+from app.backends import Backend
+
+
+class MemoryBackend(Backend):
+    name = 'memory'
+
+    def stats(self):
+        return {'locks': store.lock_stats()}
+
+    def find_user_by_email(self, email):
+        return store.find_user_by_email(email)
+
+    def create_user(self, name, email, password_hash):
+        return store.create_user(name, email, password_hash)
+
+    def list_products(self, category=None, min_price=None, max_price=None, in_stock=False,
+                      limit=None, after_id=None, fields=None):
+        return store.list_products(category, min_price, max_price, in_stock, limit, after_id, fields)
+
+    def search_products(self, query, limit=20):
+        return store.search_products(query, limit)
+
+    def get_product(self, product_id, fields=None):
+        return store.get_product_by_id(product_id, fields)
+
+    def get_products(self, product_ids, fields=None):
+        return store.get_products_by_ids(product_ids, fields)
+
+    def catalog_version(self):
+        return store.catalog_validators()
+
+    def create_product(self, data):
+        return store.create_product(data)['product_id']
+
+    def create_products(self, rows):
+        return len(store.create_products(rows))
+
+    def update_product(self, product_id, updates):
+        return store.update_product(product_id, updates) is not None
+
+    def delete_product(self, product_id):
+        return store.delete_product(product_id)
+
+    def place_order(self, user_id, items):
+        return store.place_order(user_id, items)
+
+    def get_orders_by_user(self, user_id, limit=None, after_id=None):
+        orders = store.get_orders_by_user(user_id, limit, after_id)
+        items_by_order = store.get_items_for_orders(order['order_id'] for order in orders)
+        # Store rows are shared read-only snapshots, so build new dicts.
+        return [{**order, 'items': items_by_order[order['order_id']]} for order in orders]
+
+    def get_order(self, order_id):
+        order = store.get_order_by_id(order_id)
+        if order is None:
+            return None
+        return {**order, 'items': store.get_order_items(order_id)}
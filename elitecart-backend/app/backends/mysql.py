@@ -0,0 +1,269 @@
+"""Backend over MySQL through app.database's connection pool."""
+from flask import g, has_app_context
+from mysql.connector import Error, ProgrammingError
+
+from app import database, queries
+from app.backends import Backend, OrderError, product_columns, product_ids_query, product_list_query
+from app.database import fetch_one, fetch_all, fetch_iter, insert_record, transaction
+from app.search import tokenize
+
+UPDATABLE_FIELDS = ['name', 'description', 'price', 'image_url', 'stock', 'category']
+
+# Sticky key for catalog reads as a whole (listings and the catalog version):
+# product edits set it, so the editor's next listing and its validators both
+# come from the primary.
+_CATALOG_KEY = ('catalog',)
+
+
+class MySQLBackend(Backend):
+    name = 'mysql'
+
+    def init_app(self, app):
+        # Hand each request's pooled connection back when it finishes.
+        database.init_app(app)
+
+    def stats(self):
+        return {'pool': database.pool_stats(), 'replicas': database.replica_stats()}
+
+    def _catalog_changed(self, tx):
+        # Inside the write's own transaction, so the version moves exactly
+        # when the rows do, on the primary and on every replica. The row is
+        # locked until commit, so concurrent catalog writes queue on it for
+        # their last statement.
+        try:
+            tx.execute(queries.BUMP_CATALOG_VERSION)
+        except ProgrammingError:
+            # No catalog_version table yet (a database created before it):
+            # the write goes ahead, and responses carry no validators.
+            pass
+        if has_app_context():
+            g.pop('catalog_version', None)
+
+    def find_user_by_email(self, email):
+        return fetch_one(queries.USER_BY_EMAIL, (email,), sticky_key=('email', email))
+
+    def create_user(self, name, email, password_hash):
+        user_id = insert_record(queries.INSERT_USER, (name, email, password_hash))
+        # So logging in straight after signing up finds the new account.
+        database.stick_to_primary(('email', email))
+        return {'user_id': user_id, 'name': name, 'email': email, 'password_hash': password_hash}
+
+    def list_products(self, category=None, min_price=None, max_price=None, in_stock=False,
+                      limit=None, after_id=None, fields=None):
+        query, params = product_list_query('%s', category, min_price, max_price, in_stock, after_id, limit, fields)
+        if limit is None:
+            # The whole catalog: read it lazily so it can be streamed.
+            return fetch_iter(query, params if params else None, sticky_key=_CATALOG_KEY)
+        return fetch_all(query, params if params else None, sticky_key=_CATALOG_KEY)
+
+    def search_products(self, query, limit=20):
+        # Same tokenizer as memory mode; it also strips boolean-mode operators
+        # from user input. Each term is prefix-matched via the FULLTEXT index.
+        terms = tokenize(query)
+        if not terms:
+            return []
+        boolean_query = ' '.join(f'{term}*' for term in terms)
+
+        products = fetch_all(
+            'SELECT *, MATCH(name, description) AGAINST (%s IN BOOLEAN MODE) AS relevance '
+            'FROM products WHERE MATCH(name, description) AGAINST (%s IN BOOLEAN MODE) '
+            'ORDER BY relevance DESC, product_id DESC LIMIT %s',
+            (boolean_query, boolean_query, limit),
+        )
+        for product in products:
+            product.pop('relevance', None)
+        return products
+
+    def catalog_version(self):
+        # Read from the server this request's catalog reads go to, before
+        # them: a replica only moves forward, so the rows are never older
+        # than the version tagging them. Read once per request (the ETag
+        # check and the catalog cache both ask) and never reused across
+        # requests.
+        source = database.read_replica(_CATALOG_KEY)
+        if has_app_context():
+            cached = g.get('catalog_version')
+            if cached is not None and cached[0] is source:
+                return cached[1]
+        try:
+            row = fetch_one(queries.CATALOG_VERSION, primary=source is None, sticky_key=_CATALOG_KEY)
+        except Error:
+            # No catalog_version table yet (a database created before it).
+            return None
+        if database.read_replica(_CATALOG_KEY) is not source:
+            # The replica failed and this request's reads moved elsewhere.
+            return None
+        version = (str(row['version']), float(row['modified_at'])) if row else None
+        if has_app_context():
+            g.catalog_version = (source, version)
+        return version
+
+    def get_product(self, product_id, fields=None):
+        query = queries.PRODUCT_BY_ID
+        if fields:
+            query = f'SELECT {product_columns(fields)} FROM products WHERE product_id = %s'
+        return fetch_one(query, (product_id,), sticky_key=[('product', product_id), _CATALOG_KEY])
+
+    def get_products(self, product_ids, fields=None):
+        if not product_ids:
+            return {}
+        query, params = product_ids_query('%s', product_ids, fields)
+        rows = fetch_all(query, params, sticky_key=[('product', pid) for pid in product_ids] + [_CATALOG_KEY])
+        return {row['product_id']: row for row in rows}
+
+    def create_product(self, data):
+        with transaction() as tx:
+            product_id = tx.insert(
+                queries.INSERT_PRODUCT,
+                (data['name'], data['description'], data['price'], data['image_url'], data['stock'], data['category']),
+            )
+            self._catalog_changed(tx)
+        database.stick_to_primary(('product', product_id), _CATALOG_KEY)
+        return product_id
+
+    def create_products(self, rows):
+        # One multi-row INSERT (see Transaction.executemany), one version
+        # bump for the whole batch and one commit.
+        with transaction() as tx:
+            created = tx.executemany(
+                queries.INSERT_PRODUCT,
+                [(row['name'], row['description'], row['price'], row['image_url'], row['stock'], row['category'])
+                 for row in rows],
+            )
+            self._catalog_changed(tx)
+        database.stick_to_primary(_CATALOG_KEY)
+        return created
+
+    def update_product(self, product_id, updates):
+        product = fetch_one(queries.PRODUCT_BY_ID, (product_id,), primary=True)
+        if not product:
+            return False
+
+        update_fields = []
+        params = []
+        for field in UPDATABLE_FIELDS:
+            if field in updates:
+                update_fields.append(f'{field} = %s')
+                params.append(updates[field])
+        if not update_fields:
+            return True
+
+        params.append(product_id)
+        with transaction() as tx:
+            tx.execute(f"UPDATE products SET {', '.join(update_fields)} WHERE product_id = %s", params)
+            self._catalog_changed(tx)
+        database.stick_to_primary(('product', product_id), _CATALOG_KEY)
+        return True
+
+    def delete_product(self, product_id):
+        product = fetch_one(queries.PRODUCT_BY_ID, (product_id,), primary=True)
+        if not product:
+            return False
+        with transaction() as tx:
+            tx.execute(queries.DELETE_PRODUCT, (product_id,))
+            self._catalog_changed(tx)
+        database.stick_to_primary(('product', product_id), _CATALOG_KEY)
+        return True
+
+    def place_order(self, user_id, items):
+        # The order, its items and the stock changes commit together, in
+        # four statements however many lines the order has.
+        lines = [(int(item['product_id']), int(item['quantity'])) for item in items]
+        quantities = {}
+        for product_id, quantity in lines:
+            quantities[product_id] = quantities.get(product_id, 0) + quantity
+
+        # Ascending ids, so concurrent checkouts lock rows in the same order
+        # and can't deadlock on each other.
+        product_ids = sorted(quantities)
+
+        with transaction() as tx:
+            # The whole cart is validated and priced from one IN query that
+            # also locks its rows until commit. A concurrent checkout of the
+            # same products waits here and then sees the stock left after
+            # this one, so the check below can't be raced into overselling.
+            query, params = product_ids_query('%s', product_ids, ('product_id', 'price', 'stock'))
+            products = {
+                row['product_id']: row
+                for row in tx.fetch_all(query + ' ORDER BY product_id FOR UPDATE', params)
+            }
+            for product_id, _ in lines:
+                if product_id not in products:
+                    raise OrderError('not_found', product_id)
+            for product_id in product_ids:
+                if products[product_id]['stock'] < quantities[product_id]:
+                    raise OrderError('insufficient_stock', product_id)
+
+            total_amount = sum(products[product_id]['price'] * quantity for product_id, quantity in lines)
+            order_items = [
+                {'product_id': product_id, 'quantity': quantity, 'price': products[product_id]['price']}
+                for product_id, quantity in lines
+            ]
+
+            order_id = tx.insert(queries.INSERT_ORDER, (user_id, total_amount))
+
+            tx.executemany(
+                queries.INSERT_ORDER_ITEM,
+                [(order_id, item['product_id'], item['quantity'], item['price']) for item in order_items],
+            )
+
+            cases = ' '.join(['WHEN %s THEN %s'] * len(product_ids))
+            placeholders = ', '.join(['%s'] * len(product_ids))
+            params = [value for pid in product_ids for value in (pid, quantities[pid])] + product_ids
+            tx.execute(
+                f'UPDATE products SET stock = stock - CASE product_id {cases} END '
+                f'WHERE product_id IN ({placeholders})',
+                params,
+            )
+            # Last, so the version row is held for as little of the
+            # transaction as possible.
+            self._catalog_changed(tx)
+
+        # The buyer's history, the new order and the stock they just took
+        # are read from the primary for a few seconds.
+        database.stick_to_primary(('user', user_id), ('order', order_id), *(('product', pid) for pid in quantities))
+        for item in order_items:
+            item['order_id'] = order_id
+        return {'order_id': order_id, 'user_id': user_id, 'total_amount': total_amount, 'items': order_items}
+
+    def _attach_items(self, orders, sticky_key):
+        # All items for these orders in one query (idx_order_item_order),
+        # grouped here, so history costs two queries however many orders.
+        if not orders:
+            return orders
+        order_ids = [order['order_id'] for order in orders]
+        placeholders = ', '.join(['%s'] * len(order_ids))
+        items = fetch_all(
+            f'SELECT * FROM order_items WHERE order_id IN ({placeholders}) ORDER BY order_item_id',
+            order_ids,
+            sticky_key=sticky_key,
+        )
+        items_by_order = {order_id: [] for order_id in order_ids}
+        for item in items:
+            items_by_order[item['order_id']].append(item)
+        for order in orders:
+            order['items'] = items_by_order[order['order_id']]
+        return orders
+
+    def get_orders_by_user(self, user_id, limit=None, after_id=None):
+        # idx_order_user(user_id) implicitly ends in the order_id primary key,
+        # so this is an index range scan in id order with no filesort.
+        query = 'SELECT * FROM orders WHERE user_id = %s'
+        params = [user_id]
+        if after_id is not None:
+            query += ' AND order_id < %s'
+            params.append(after_id)
+        query += ' ORDER BY order_id DESC'
+        if limit:
+            query += ' LIMIT %s'
+            params.append(limit)
+        sticky_key = ('user', user_id)
+        return self._attach_items(fetch_all(query, params, sticky_key=sticky_key), sticky_key)
+
+    def get_order(self, order_id):
+        sticky_key = ('order', order_id)
+        order = fetch_one(queries.ORDER_BY_ID, (order_id,), sticky_key=sticky_key)
+        if not order:
+            return None
+        order['items'] = fetch_all(queries.ORDER_ITEMS_BY_ORDER, (order_id,), sticky_key=sticky_key)
+        return order
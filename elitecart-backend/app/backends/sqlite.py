@@ -0,0 +1,379 @@
+"""Backend over a single SQLite file in WAL mode.
+
+A durable, zero-service option for one node: readers never block the writer
+or each other, and writes serialize on SQLite's database lock. place_order
+starts its transaction with BEGIN IMMEDIATE, which takes that lock up front,
+so its stock check and decrement can't interleave with another checkout.
+
+Connections come from an app.pool.ConnectionPool like MySQL's. Search uses
+an FTS5 index kept in sync by triggers, falling back to LIKE on SQLite
+builds without FTS5.
+"""
+from contextlib import contextmanager
+import sqlite3
+
+from app.backends import Backend, OrderError, product_columns, product_ids_query, product_list_query
+from app.pool import ConnectionPool
+from app.search import tokenize
+from app.store import seed_products
+
+UPDATABLE_FIELDS = ['name', 'description', 'price', 'image_url', 'stock', 'category']
+
+_NOW = "(strftime('%Y-%m-%dT%H:%M:%fZ', 'now'))"
+_EPOCH_NOW = "((julianday('now') - 2440587.5) * 86400.0)"
+
+_SCHEMA = f'''
+CREATE TABLE IF NOT EXISTS users (
+    user_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    email TEXT UNIQUE NOT NULL,
+    password_hash TEXT NOT NULL,
+    created_at TEXT DEFAULT {_NOW}
+);
+
+CREATE TABLE IF NOT EXISTS products (
+    product_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    description TEXT NOT NULL,
+    price REAL NOT NULL,
+    image_url TEXT NOT NULL,
+    stock INTEGER NOT NULL DEFAULT 0,
+    category TEXT NOT NULL,
+    created_at TEXT DEFAULT {_NOW}
+);
+
+CREATE TABLE IF NOT EXISTS orders (
+    order_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL REFERENCES users(user_id) ON DELETE CASCADE,
+    total_amount REAL NOT NULL,
+    created_at TEXT DEFAULT {_NOW}
+);
+
+CREATE TABLE IF NOT EXISTS order_items (
+    order_item_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    order_id INTEGER NOT NULL REFERENCES orders(order_id) ON DELETE CASCADE,
+    product_id INTEGER NOT NULL REFERENCES products(product_id) ON DELETE CASCADE,
+    quantity INTEGER NOT NULL,
+    price REAL NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_product_category_price ON products(category, price);
+CREATE INDEX IF NOT EXISTS idx_product_price ON products(price);
+CREATE INDEX IF NOT EXISTS idx_order_user ON orders(user_id);
+CREATE INDEX IF NOT EXISTS idx_order_item_order ON order_items(order_id);
+CREATE INDEX IF NOT EXISTS idx_order_item_product ON order_items(product_id);
+
+-- One row, bumped by triggers on every product write (stock included) in
+-- the writer's own transaction; writers are serialized anyway, so this adds
+-- no contention.
+CREATE TABLE IF NOT EXISTS catalog_version (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    version INTEGER NOT NULL,
+    modified_at REAL NOT NULL
+);
+
+INSERT OR IGNORE INTO catalog_version (id, version, modified_at) VALUES (1, 0, {_EPOCH_NOW});
+
+CREATE TRIGGER IF NOT EXISTS products_version_insert AFTER INSERT ON products BEGIN
+    UPDATE catalog_version SET version = version + 1, modified_at = {_EPOCH_NOW};
+END;
+
+CREATE TRIGGER IF NOT EXISTS products_version_update AFTER UPDATE ON products BEGIN
+    UPDATE catalog_version SET version = version + 1, modified_at = {_EPOCH_NOW};
+END;
+
+CREATE TRIGGER IF NOT EXISTS products_version_delete AFTER DELETE ON products BEGIN
+    UPDATE catalog_version SET version = version + 1, modified_at = {_EPOCH_NOW};
+END;
+'''
+
+_FTS_SCHEMA = '''
+CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+    name, description, content='products', content_rowid='product_id'
+);
+
+CREATE TRIGGER IF NOT EXISTS products_fts_insert AFTER INSERT ON products BEGIN
+    INSERT INTO products_fts(rowid, name, description) VALUES (new.product_id, new.name, new.description);
+END;
+
+CREATE TRIGGER IF NOT EXISTS products_fts_delete AFTER DELETE ON products BEGIN
+    INSERT INTO products_fts(products_fts, rowid, name, description)
+    VALUES ('delete', old.product_id, old.name, old.description);
+END;
+
+CREATE TRIGGER IF NOT EXISTS products_fts_update AFTER UPDATE OF name, description ON products BEGIN
+    INSERT INTO products_fts(products_fts, rowid, name, description)
+    VALUES ('delete', old.product_id, old.name, old.description);
+    INSERT INTO products_fts(rowid, name, description) VALUES (new.product_id, new.name, new.description);
+END;
+'''
+
+_INSERT_PRODUCT = (
+    'INSERT INTO products (name, description, price, image_url, stock, category) VALUES (?, ?, ?, ?, ?, ?)'
+)
+
+
+def _dict_row(cursor, row):
+    return {column[0]: value for column, value in zip(cursor.description, row)}
+
+
+def _reset(connection):
+    if connection.in_transaction:
+        connection.rollback()
+
+
+class SQLiteBackend(Backend):
+    name = 'sqlite'
+
+    def __init__(self, path, pool_size=8, max_overflow=8):
+        self.path = path
+        self._pool = ConnectionPool(
+            self._connect,
+            reset=_reset,
+            size=pool_size,
+            max_overflow=max_overflow,
+            # Nothing on the other end can drop an idle file handle.
+            idle_timeout=float('inf'),
+        )
+        self._fts = self._create_schema()
+
+    def _connect(self):
+        # isolation_level=None: autocommit unless a transaction is begun
+        # explicitly, so reads never hold a snapshot open between calls.
+        connection = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+        connection.row_factory = _dict_row
+        connection.execute('PRAGMA journal_mode = WAL')
+        # With WAL, NORMAL only fsyncs at checkpoints; a power loss can drop
+        # the last commits but never corrupts the file.
+        connection.execute('PRAGMA synchronous = NORMAL')
+        connection.execute('PRAGMA foreign_keys = ON')
+        return connection
+
+    def _create_schema(self):
+        # executescript commits first, so it runs outside a transaction.
+        with self._connection() as connection:
+            connection.executescript(_SCHEMA)
+            try:
+                connection.executescript(_FTS_SCHEMA)
+                fts = True
+            except sqlite3.OperationalError:
+                fts = False
+        # Seeding checks and inserts under the write lock, so only one of
+        # several workers opening a new file seeds it.
+        with self._transaction() as connection:
+            if connection.execute('SELECT 1 FROM products LIMIT 1').fetchone() is None:
+                connection.executemany(_INSERT_PRODUCT, [
+                    (p['name'], p['description'], p['price'], p['image_url'], p['stock'], p['category'])
+                    for p in seed_products()
+                ])
+        return fts
+
+    @contextmanager
+    def _connection(self):
+        connection = self._pool.checkout()
+        try:
+            yield connection
+        finally:
+            self._pool.checkin(connection)
+
+    @contextmanager
+    def _transaction(self):
+        """Take the write lock now rather than at the first write, so a
+        read-check-write sequence inside can't be invalidated mid-way."""
+        with self._connection() as connection:
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                yield connection
+                connection.execute('COMMIT')
+            except BaseException:
+                connection.execute('ROLLBACK')
+                raise
+
+    def _fetch_one(self, query, params=()):
+        with self._connection() as connection:
+            return connection.execute(query, params).fetchone()
+
+    def _fetch_all(self, query, params=()):
+        with self._connection() as connection:
+            return connection.execute(query, params).fetchall()
+
+    def _fetch_iter(self, query, params=(), chunk_size=500):
+        with self._connection() as connection:
+            cursor = connection.execute(query, params)
+            try:
+                while True:
+                    rows = cursor.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    yield from rows
+            finally:
+                cursor.close()
+
+    def stats(self):
+        return {'path': self.path, 'fts': self._fts, 'pool': self._pool.stats()}
+
+    def find_user_by_email(self, email):
+        return self._fetch_one('SELECT * FROM users WHERE email = ?', (email,))
+
+    def create_user(self, name, email, password_hash):
+        with self._transaction() as connection:
+            user_id = connection.execute(
+                'INSERT INTO users (name, email, password_hash) VALUES (?, ?, ?)',
+                (name, email, password_hash),
+            ).lastrowid
+            return connection.execute('SELECT * FROM users WHERE user_id = ?', (user_id,)).fetchone()
+
+    def list_products(self, category=None, min_price=None, max_price=None, in_stock=False,
+                      limit=None, after_id=None, fields=None):
+        query, params = product_list_query('?', category, min_price, max_price, in_stock, after_id, limit, fields)
+        if limit is None:
+            return self._fetch_iter(query, params)
+        return self._fetch_all(query, params)
+
+    def search_products(self, query, limit=20):
+        terms = tokenize(query)
+        if not terms:
+            return []
+        # Any term may match, as in the memory index and MySQL's boolean
+        # mode; products matching more of them rank first.
+        if not self._fts:
+            matches = ['(name LIKE ? OR description LIKE ?)'] * len(terms)
+            params = [pattern for term in terms for pattern in (f'%{term}%',) * 2]
+            any_match = ' OR '.join(matches)
+            match_count = ' + '.join(matches)
+            return self._fetch_all(
+                f'SELECT * FROM products WHERE {any_match} '
+                f'ORDER BY {match_count} DESC, product_id DESC LIMIT ?',
+                params + params + [limit],
+            )
+        # Tokens are [a-z0-9]+, so quoting them is enough to keep FTS5 query
+        # syntax out; each one is prefix-matched. bm25() weighs name matches
+        # double, like the memory index.
+        match = ' OR '.join(f'"{term}"*' for term in terms)
+        return self._fetch_all(
+            'SELECT products.* FROM products_fts JOIN products ON products.product_id = products_fts.rowid '
+            'WHERE products_fts MATCH ? ORDER BY bm25(products_fts, 2.0, 1.0), products.product_id DESC LIMIT ?',
+            (match, limit),
+        )
+
+    def get_product(self, product_id, fields=None):
+        return self._fetch_one(f'SELECT {product_columns(fields)} FROM products WHERE product_id = ?', (product_id,))
+
+    def get_products(self, product_ids, fields=None):
+        if not product_ids:
+            return {}
+        query, params = product_ids_query('?', product_ids, fields)
+        return {row['product_id']: row for row in self._fetch_all(query, params)}
+
+    def catalog_version(self):
+        row = self._fetch_one('SELECT version, modified_at FROM catalog_version WHERE id = 1')
+        return str(row['version']), row['modified_at']
+
+    def create_product(self, data):
+        with self._transaction() as connection:
+            return connection.execute(
+                _INSERT_PRODUCT,
+                (data['name'], data['description'], data['price'], data['image_url'], data['stock'], data['category']),
+            ).lastrowid
+
+    def create_products(self, rows):
+        with self._transaction() as connection:
+            connection.executemany(
+                _INSERT_PRODUCT,
+                [(row['name'], row['description'], row['price'], row['image_url'], row['stock'], row['category'])
+                 for row in rows],
+            )
+            return len(rows)
+
+    def update_product(self, product_id, updates):
+        fields = [field for field in UPDATABLE_FIELDS if field in updates]
+        if not fields:
+            return self.get_product(product_id) is not None
+        assignments = ', '.join(f'{field} = ?' for field in fields)
+        params = [updates[field] for field in fields] + [product_id]
+        with self._transaction() as connection:
+            cursor = connection.execute(f'UPDATE products SET {assignments} WHERE product_id = ?', params)
+            return cursor.rowcount > 0
+
+    def delete_product(self, product_id):
+        with self._transaction() as connection:
+            cursor = connection.execute('DELETE FROM products WHERE product_id = ?', (product_id,))
+            return cursor.rowcount > 0
+
+    def place_order(self, user_id, items):
+        lines = [(int(item['product_id']), int(item['quantity'])) for item in items]
+        quantities = {}
+        for product_id, quantity in lines:
+            quantities[product_id] = quantities.get(product_id, 0) + quantity
+
+        with self._transaction() as connection:
+            query, params = product_ids_query('?', list(quantities), ('product_id', 'price', 'stock'))
+            products = {row['product_id']: row for row in connection.execute(query, params)}
+            for product_id, _ in lines:
+                if product_id not in products:
+                    raise OrderError('not_found', product_id)
+            for product_id, quantity in quantities.items():
+                if products[product_id]['stock'] < quantity:
+                    raise OrderError('insufficient_stock', product_id)
+
+            total_amount = sum(products[product_id]['price'] * quantity for product_id, quantity in lines)
+            order_id = connection.execute(
+                'INSERT INTO orders (user_id, total_amount) VALUES (?, ?)',
+                (user_id, total_amount),
+            ).lastrowid
+            # In-process calls, so one statement per row costs no round trips
+            # and gives each item its id.
+            order_items = []
+            for product_id, quantity in lines:
+                item = {
+                    'order_id': order_id,
+                    'product_id': product_id,
+                    'quantity': quantity,
+                    'price': products[product_id]['price'],
+                }
+                item['order_item_id'] = connection.execute(
+                    'INSERT INTO order_items (order_id, product_id, quantity, price) VALUES (?, ?, ?, ?)',
+                    (order_id, product_id, quantity, item['price']),
+                ).lastrowid
+                order_items.append(item)
+            connection.executemany(
+                'UPDATE products SET stock = stock - ? WHERE product_id = ?',
+                [(quantity, product_id) for product_id, quantity in quantities.items()],
+            )
+            order = connection.execute('SELECT * FROM orders WHERE order_id = ?', (order_id,)).fetchone()
+        return {**order, 'items': order_items}
+
+    def _attach_items(self, connection, orders):
+        if not orders:
+            return orders
+        order_ids = [order['order_id'] for order in orders]
+        placeholders = ', '.join(['?'] * len(order_ids))
+        items_by_order = {order_id: [] for order_id in order_ids}
+        for item in connection.execute(
+            f'SELECT * FROM order_items WHERE order_id IN ({placeholders}) ORDER BY order_item_id',
+            order_ids,
+        ):
+            items_by_order[item['order_id']].append(item)
+        for order in orders:
+            order['items'] = items_by_order[order['order_id']]
+        return orders
+
+    def get_orders_by_user(self, user_id, limit=None, after_id=None):
+        query = 'SELECT * FROM orders WHERE user_id = ?'
+        params = [user_id]
+        if after_id is not None:
+            query += ' AND order_id < ?'
+            params.append(after_id)
+        query += ' ORDER BY order_id DESC'
+        if limit:
+            query += ' LIMIT ?'
+            params.append(limit)
+        with self._connection() as connection:
+            return self._attach_items(connection, connection.execute(query, params).fetchall())
+
+    def get_order(self, order_id):
+        with self._connection() as connection:
+            order = connection.execute('SELECT * FROM orders WHERE order_id = ?', (order_id,)).fetchone()
+            if order is None:
+                return None
+            return self._attach_items(connection, [order])[0]
@@ -0,0 +1,109 @@
+"""Bulk product import and export.
+
+POST /api/products/bulk reads NDJSON (one product object per line) or CSV
+(a header row naming the fields) straight off the request stream. Rows are
+validated with ProductCreate one at a time and handed to
+Backend.create_products in batches of BATCH_SIZE, so neither the upload nor
+the parsed catalog is ever held in memory whole. Each batch is committed on
+its own: rows that fail validation are reported and skipped, and a storage
+error stops the import with earlier batches already stored.
+
+GET /api/products/export writes the catalog back out in either format. Its
+extra columns (product_id, created_at) are ignored on import, so an export
+can be fed straight back in.
+"""
+import codecs
+import csv
+import json
+
+from pydantic import ValidationError
+
+from app.schemas.schemas import ProductCreate
+
+CSV_MIMETYPE = 'text/csv'
+BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+
+PRODUCT_FIELDS = ('name', 'description', 'price', 'image_url', 'stock', 'category')
+EXPORT_FIELDS = ('product_id',) + PRODUCT_FIELDS + ('created_at',)
+
+
+def ndjson_records(stream):
+    """(line number, dict or None, error or None) for each non-blank line."""
+    for line_number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield line_number, None, 'invalid JSON'
+            continue
+        if not isinstance(record, dict):
+            yield line_number, None, 'expected a JSON object'
+            continue
+        yield line_number, record, None
+
+
+def csv_records(stream):
+    """The same for CSV with a header row; line numbers count the header."""
+    reader = csv.DictReader(codecs.iterdecode(stream, 'utf-8-sig'))
+    try:
+        for record in reader:
+            # Cells beyond the header land under the key None.
+            yield reader.line_num, {key: value for key, value in record.items() if key is not None}, None
+    except (csv.Error, UnicodeDecodeError) as err:
+        yield reader.line_num, None, f'unreadable CSV: {err}'
+
+
+def _validation_message(err):
+    return '; '.join(f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in err.errors())
+
+
+class ImportReport:
+    """Counts for one import, keeping the first MAX_REPORTED_ERRORS rejections."""
+
+    def __init__(self):
+        self.created = 0
+        self.rejected = 0
+        self.errors = []
+
+    def reject(self, line_number, error):
+        self.rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line_number, 'error': error})
+
+    def to_dict(self):
+        return {'created': self.created, 'rejected': self.rejected, 'errors': self.errors}
+
+
+def validated_batches(records, report, batch_size=BATCH_SIZE):
+    """Yield lists of up to batch_size valid product rows; invalid ones go to report."""
+    batch = []
+    for line_number, record, error in records:
+        if error is None:
+            try:
+                product = ProductCreate(**record)
+            except ValidationError as err:
+                error = _validation_message(err)
+        if error is not None:
+            report.reject(line_number, error)
+            continue
+        batch.append({field: getattr(product, field) for field in PRODUCT_FIELDS})
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def csv_lines(rows, fields=EXPORT_FIELDS):
+    """CSV text for rows, a header line then one line per row."""
+    class _Line:
+        def write(self, text):
+            return text
+
+    writer = csv.writer(_Line())
+    yield writer.writerow(fields)
+    for row in rows:
+        yield writer.writerow([row.get(field) for field in fields])
@@ -0,0 +1,348 @@
+"""Write-invalidated cache for catalog reads.
+
+Used by app.backends.cached.CachedBackend. Two kinds of entries:
+
+    product:<id>        one product row
+    page:<filters>      one keyset page of GET /api/products, keyed on the
+                        normalized filters, page size, cursor and fields
+
+Invalidation is precise rather than time based. A write to product P drops
+P's row and every cached page that contains P. It also drops any page P's new
+version could now appear in: the page's filters match the new row and P's id
+falls inside the id range the page covers. A stock decrement only needs
+the first part, because it can't add a product to a listing. The TTL only
+bounds staleness from writes this process never sees (other workers, direct
+SQL).
+
+Every entry is stamped with the catalog version (Backend.catalog_version)
+read before it was filled, and is only served to a request that reads the
+same version. A write this process never sees still retires its entries as
+soon as the version moves, and a body is never tagged with a version older
+than itself.
+
+Entries live in a process-local LRU (LocalCacheStore) or, to share them
+between workers, in Redis (RedisCacheStore; needs `pip install redis`).
+"""
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic
+import json
+import pickle
+
+try:
+    import redis
+except ImportError:  # optional dependency
+    redis = None
+
+
+def page_key(category, min_price, max_price, in_stock, limit, after_id, fields=None):
+    return 'page:' + json.dumps([category or None, min_price, max_price, bool(in_stock), limit, after_id, fields])
+
+
+def product_key(product_id):
+    return f'product:{int(product_id)}'
+
+
+def page_meta(category, min_price, max_price, in_stock, limit, after_id, rows):
+    """What invalidation needs to know about a cached page.
+
+    The page covers ids below after_id (or all ids if it is the first page)
+    down to its last row when it is full, or down to 0 when it is the last
+    page, so a new matching product with an id in that range belongs on it.
+    """
+    ids = [row['product_id'] for row in rows]
+    return {
+        'category': category or None,
+        'min_price': min_price,
+        'max_price': max_price,
+        'in_stock': bool(in_stock),
+        'low': min(ids) if limit and len(ids) >= limit else None,
+        'high': after_id,
+        'ids': ids,
+    }
+
+
+def _matches(meta, row):
+    if meta['category'] and row['category'] != meta['category']:
+        return False
+    if meta['min_price'] is not None and row['price'] < meta['min_price']:
+        return False
+    if meta['max_price'] is not None and row['price'] > meta['max_price']:
+        return False
+    if meta['in_stock'] and row['stock'] <= 0:
+        return False
+    return True
+
+
+def _affects(meta, product_id, row):
+    if product_id in meta['ids']:
+        return True
+    if row is None:
+        return False
+    if meta['low'] is not None and product_id <= meta['low']:
+        return False
+    if meta['high'] is not None and product_id >= meta['high']:
+        return False
+    return _matches(meta, row)
+
+
+class LocalCacheStore:
+    """A thread-safe LRU of up to max_entries entries, each living ttl seconds."""
+
+    def __init__(self, max_entries=2048, ttl=30.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = Lock()
+        # key -> (expires_at, value, meta); least recently used first.
+        self._entries = OrderedDict()
+        self._containing = {}
+        self.evictions = 0
+        self.expirations = 0
+
+    def _remove(self, key):
+        # Caller holds _lock.
+        _, _, meta = self._entries.pop(key)
+        if meta is not None:
+            for product_id in meta['ids']:
+                keys = self._containing.get(product_id)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del self._containing[product_id]
+
+    def get(self, key):
+        with self._lock:
+            return self._get(key)
+
+    def _get(self, key):
+        # Caller holds _lock.
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= monotonic():
+            self._remove(key)
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def get_many(self, keys):
+        with self._lock:
+            return [self._get(key) for key in keys]
+
+    def set(self, key, value, meta=None):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (monotonic() + self.ttl, value, meta)
+            if meta is not None:
+                for product_id in meta['ids']:
+                    self._containing.setdefault(product_id, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def delete(self, keys):
+        with self._lock:
+            for key in keys:
+                if key in self._entries:
+                    self._remove(key)
+
+    def pages_containing(self, product_id):
+        with self._lock:
+            return list(self._containing.get(product_id, ()))
+
+    def pages(self):
+        with self._lock:
+            return [(key, meta) for key, (_, _, meta) in self._entries.items() if meta is not None]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'store': 'local',
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
+
+
+class RedisCacheStore:
+    """The same interface over Redis, shared by every worker that points at it.
+
+    Expiry and eviction are Redis's (set maxmemory-policy to allkeys-lru).
+    Page metadata is kept in a hash, with one set per product naming the
+    pages that contain it, so any worker can invalidate precisely.
+    """
+
+    def __init__(self, url, ttl=30.0, prefix='elitecart:catalog:'):
+        if redis is None:
+            raise RuntimeError('CATALOG_CACHE=redis needs the redis package (pip install redis)')
+        self._client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self._prefix = prefix
+        self._pages_key = prefix + 'pages'
+
+    def _containing_key(self, product_id):
+        return f'{self._prefix}containing:{product_id}'
+
+    def get(self, key):
+        data = self._client.get(self._prefix + key)
+        return pickle.loads(data) if data is not None else None
+
+    def get_many(self, keys):
+        if not keys:
+            return []
+        # One MGET round trip for the lot.
+        values = self._client.mget([self._prefix + key for key in keys])
+        return [pickle.loads(data) if data is not None else None for data in values]
+
+    def set(self, key, value, meta=None):
+        ttl_ms = int(self.ttl * 1000)
+        pipe = self._client.pipeline(transaction=False)
+        pipe.set(self._prefix + key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), px=ttl_ms)
+        if meta is not None:
+            pipe.hset(self._pages_key, key, json.dumps(meta))
+            for product_id in meta['ids']:
+                pipe.sadd(self._containing_key(product_id), key)
+                pipe.pexpire(self._containing_key(product_id), ttl_ms)
+        pipe.execute()
+
+    def delete(self, keys):
+        keys = list(keys)
+        if keys:
+            pipe = self._client.pipeline(transaction=False)
+            pipe.delete(*[self._prefix + key for key in keys])
+            pipe.hdel(self._pages_key, *keys)
+            pipe.execute()
+
+    def pages_containing(self, product_id):
+        return [key.decode() for key in self._client.smembers(self._containing_key(product_id))]
+
+    def pages(self):
+        pages = [(key.decode(), json.loads(meta)) for key, meta in self._client.hgetall(self._pages_key).items()]
+        if not pages:
+            return pages
+        # Drop metadata for pages Redis has already expired.
+        pipe = self._client.pipeline(transaction=False)
+        for key, _ in pages:
+            pipe.exists(self._prefix + key)
+        alive = pipe.execute()
+        expired = [key for (key, _), exists in zip(pages, alive) if not exists]
+        if expired:
+            self._client.hdel(self._pages_key, *expired)
+        return [page for page, exists in zip(pages, alive) if exists]
+
+    def stats(self):
+        info = self._client.info('stats')
+        return {
+            'store': 'redis',
+            'pages': self._client.hlen(self._pages_key),
+            'evictions': info.get('evicted_keys', 0),
+            'expirations': info.get('expired_keys', 0),
+        }
+
+
+class CatalogCache:
+    """Product rows and listing pages, with precise invalidation.
+
+    fill_delay keeps entries affected by a write from being refilled for that
+    many seconds, for setups where reads may come from a replica that hasn't
+    applied the write yet.
+    """
+
+    def __init__(self, store, fill_delay=0.0):
+        self.store = store
+        self.fill_delay = fill_delay
+        self._lock = Lock()
+        # Bumped on every invalidation; a fill that started before one is
+        # dropped, since it may have read the old data.
+        self._generation = 0
+        # product_id -> (deadline, row after the write) within fill_delay.
+        self._recent = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def generation(self):
+        return self._generation
+
+    def get(self, key, version):
+        """The entry under key if it was filled at this catalog version, else None."""
+        entry = self.store.get(key)
+        value = entry[1] if entry is not None and entry[0] == version else None
+        # Counters are approximate under concurrency; they are only stats.
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def get_many(self, keys, version):
+        values = [entry[1] if entry is not None and entry[0] == version else None
+                  for entry in self.store.get_many(keys)]
+        misses = values.count(None)
+        self.misses += misses
+        self.hits += len(values) - misses
+        return values
+
+    def _recently_changed(self):
+        now = monotonic()
+        with self._lock:
+            for product_id in [pid for pid, (deadline, _) in self._recent.items() if deadline <= now]:
+                del self._recent[product_id]
+            return list(self._recent.items())
+
+    def put_product(self, product_id, row, generation, version):
+        if generation != self._generation:
+            return
+        if any(pid == product_id for pid, _ in self._recently_changed()):
+            return
+        self.store.set(product_key(product_id), (version, row))
+
+    def put_page(self, key, rows, meta, generation, version):
+        if generation != self._generation:
+            return
+        if any(_affects(meta, pid, row) for pid, (_, row) in self._recently_changed()):
+            return
+        self.store.set(key, (version, rows), meta)
+
+    def _invalidated(self, product_id, row):
+        with self._lock:
+            self._generation += 1
+            self.invalidations += 1
+            if self.fill_delay:
+                self._recent[product_id] = (monotonic() + self.fill_delay, row)
+
+    def invalidate_product(self, product_id, row):
+        """product_id was created, updated or deleted; row is it now (None if gone)."""
+        self._invalidated(product_id, row)
+        stale = [product_key(product_id)]
+        stale += [key for key, meta in self.store.pages() if _affects(meta, product_id, row)]
+        self.store.delete(stale)
+
+    def invalidate_listings(self):
+        """Drop every cached page, for writes too large to invalidate one by one."""
+        with self._lock:
+            self._generation += 1
+            self.invalidations += 1
+        self.store.delete([key for key, _ in self.store.pages()])
+
+    def invalidate_stock(self, product_ids):
+        """Stock of product_ids went down: only their rows and the pages showing them change."""
+        stale = []
+        for product_id in product_ids:
+            self._invalidated(product_id, None)
+            stale.append(product_key(product_id))
+            stale += self.store.pages_containing(product_id)
+        self.store.delete(stale)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'invalidations': self.invalidations,
+            **self.store.stats(),
+        }
@@ -0,0 +1,138 @@
+"""Columnar product catalog used by app.store when STORE_COLUMNAR_CATALOG=1.
+
+Keeps product_id, price, stock and a category code in contiguous NumPy
+columns so list_products filters are evaluated as vectorized boolean masks.
+The full product dicts stay in app.store; this only answers "which ids match".
+
+Writers are serialized by an internal lock. Readers never take it: the row
+count and column arrays are published together as one tuple, so filter_ids
+always slices a consistent set of arrays even while a writer grows or
+compacts them.
+"""
+from collections import namedtuple
+from threading import Lock
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency
+    np = None
+
+_INITIAL_CAPACITY = 1024
+
+_Columns = namedtuple('_Columns', 'size product_id price stock category alive')
+
+
+def is_available():
+    return np is not None
+
+
+def _allocate(capacity):
+    return _Columns(
+        0,
+        np.zeros(capacity, dtype=np.int64),
+        np.zeros(capacity, dtype=np.float64),
+        np.zeros(capacity, dtype=np.int64),
+        np.zeros(capacity, dtype=np.int32),
+        np.zeros(capacity, dtype=bool),
+    )
+
+
+class ColumnarCatalog:
+    def __init__(self, capacity=_INITIAL_CAPACITY):
+        self._lock = Lock()
+        self._columns = _allocate(capacity)
+        self._dead = 0
+        self._row_of = {}
+        self._category_codes = {}
+
+    def _grow(self):
+        old = self._columns
+        new = _allocate(max(_INITIAL_CAPACITY, len(old.product_id) * 2))
+        for new_column, column in zip(new[1:], old[1:]):
+            new_column[:old.size] = column[:old.size]
+        self._columns = new._replace(size=old.size)
+
+    def _compact(self):
+        """Drop deleted rows, preserving row order (and therefore id order)."""
+        old = self._columns
+        keep = old.alive[:old.size]
+        kept = [column[:old.size][keep] for column in old[1:]]
+        size = len(kept[0])
+        new = _allocate(max(_INITIAL_CAPACITY, size * 2))
+        for new_column, column in zip(new[1:], kept):
+            new_column[:size] = column
+        self._row_of = {int(product_id): row for row, product_id in enumerate(kept[0])}
+        self._dead = 0
+        self._columns = new._replace(size=size)
+
+    def _category_code(self, category):
+        code = self._category_codes.get(category)
+        if code is None:
+            code = len(self._category_codes)
+            self._category_codes[category] = code
+        return code
+
+    def __len__(self):
+        return self._columns.size - self._dead
+
+    def upsert(self, product):
+        """Insert a new product row, or overwrite the columns of an existing one.
+
+        New products must arrive in increasing product_id order (as
+        create_product assigns them) so row order doubles as id order.
+        """
+        with self._lock:
+            code = self._category_code(product['category'])
+            row = self._row_of.get(product['product_id'])
+            if row is not None:
+                columns = self._columns
+                columns.price[row] = product['price']
+                columns.stock[row] = product['stock']
+                columns.category[row] = code
+                return
+            if self._columns.size == len(self._columns.product_id):
+                self._grow()
+            columns = self._columns
+            row = columns.size
+            columns.product_id[row] = product['product_id']
+            columns.price[row] = product['price']
+            columns.stock[row] = product['stock']
+            columns.category[row] = code
+            columns.alive[row] = True
+            self._row_of[product['product_id']] = row
+            # Publishing the larger size is what makes the row visible.
+            self._columns = columns._replace(size=row + 1)
+
+    def set_stock(self, product_id, stock):
+        with self._lock:
+            row = self._row_of.get(product_id)
+            if row is not None:
+                self._columns.stock[row] = stock
+
+    def remove(self, product_id):
+        with self._lock:
+            row = self._row_of.pop(product_id, None)
+            if row is None:
+                return
+            self._columns.alive[row] = False
+            self._dead += 1
+            if self._dead > _INITIAL_CAPACITY and self._dead * 2 > self._columns.size:
+                self._compact()
+
+    def filter_ids(self, category=None, min_price=None, max_price=None, in_stock=False):
+        """Return matching product ids, newest (highest id) first."""
+        columns = self._columns
+        size = columns.size
+        mask = columns.alive[:size].copy()
+        if category:
+            code = self._category_codes.get(category)
+            if code is None:
+                return []
+            mask &= columns.category[:size] == code
+        if min_price is not None:
+            mask &= columns.price[:size] >= float(min_price)
+        if max_price is not None:
+            mask &= columns.price[:size] <= float(max_price)
+        if in_stock:
+            mask &= columns.stock[:size] > 0
+        return columns.product_id[:size][mask][::-1].tolist()
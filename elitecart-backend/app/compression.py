@@ -0,0 +1,110 @@
+"""Negotiated gzip/brotli compression of API responses.
+
+Registered by create_app as an after_request hook. A JSON, NDJSON or CSV
+response is compressed when the client accepts it and the body is at least
+COMPRESS_MIN_BYTES (default 1024). Streamed responses are compressed chunk
+by chunk, each flushed as it goes out so clients still get rows as they are
+produced. Brotli (in requirements.txt) is preferred when the client
+accepts it and the package is importable; gzip otherwise. COMPRESSION=off leaves
+everything to a proxy in front of the app.
+
+A compressed body is a different byte sequence, so its ETag is made weak
+(as nginx does). Weak comparison still matches it in If-None-Match.
+"""
+import os
+import zlib
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = ('application/json', 'application/x-ndjson', 'text/csv')
+
+_GZIP_LEVEL = 6
+# Quality 4 to 5 is where brotli beats gzip -6 on both speed and size for
+# JSON; the default of 11 is meant for static assets.
+_BROTLI_QUALITY = 4
+
+
+def _choose_encoding(request):
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+
+# Each returns (compress, flush, finish): flush emits everything compressed
+# so far without ending the stream, finish ends it.
+
+def _gzip_compressor():
+    # wbits 31: a gzip header and trailer around the deflate stream.
+    compressor = zlib.compressobj(_GZIP_LEVEL, zlib.DEFLATED, 31)
+    return compressor.compress, lambda: compressor.flush(zlib.Z_SYNC_FLUSH), compressor.flush
+
+
+def _brotli_compressor():
+    compressor = brotli.Compressor(quality=_BROTLI_QUALITY)
+    return compressor.process, compressor.flush, compressor.finish
+
+
+_COMPRESSORS = {'gzip': _gzip_compressor, 'br': _brotli_compressor}
+
+
+def _compressed_stream(chunks, encoding):
+    compress, flush, finish = _COMPRESSORS[encoding]()
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode()
+        if not chunk:
+            continue
+        # Flushed per chunk, so streaming isn't undone by the compressor
+        # holding output back; app.streaming sends about 64KB at a time, so
+        # this costs little ratio.
+        data = compress(chunk) + flush()
+        if data:
+            yield data
+    yield finish()
+
+
+def compress_response(response, request, min_bytes):
+    if response.status_code < 200 or response.status_code in (204, 206, 304) \
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES \
+            or 'Content-Encoding' in response.headers:
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = _choose_encoding(request)
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        # Large by design (see app.streaming); compress as it goes out.
+        response.response = _compressed_stream(response.response, encoding)
+        response.headers.pop('Content-Length', None)
+    else:
+        body = response.get_data()
+        if len(body) < min_bytes:
+            return response
+        compress, _, finish = _COMPRESSORS[encoding]()
+        response.set_data(compress(body) + finish())
+
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_app(app):
+    if os.getenv('COMPRESSION', 'on').strip().lower() == 'off':
+        return
+    min_bytes = int(os.getenv('COMPRESS_MIN_BYTES', 1024))
+
+    @app.after_request
+    def compress(response):
+        return compress_response(response, request, min_bytes)
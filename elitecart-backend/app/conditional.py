@@ -0,0 +1,58 @@
+"""Conditional GET for catalog responses.
+
+The catalog version (Backend.catalog_version) is a strong ETag, and its time
+is Last-Modified. A request whose If-None-Match (or, without one,
+If-Modified-Since) still matches is answered with 304 before any product is
+loaded or serialized. Since any product write changes the version, a client
+revalidates every cached catalog response after each write; in exchange,
+checking costs one read of the version instead of a query and a body. On
+MySQL the version is bumped in each write's own transaction and read from
+the server the request's catalog reads go to, so the validators never run
+ahead of the body.
+
+Responses carry Cache-Control: no-cache (CATALOG_CACHE_CONTROL overrides it),
+so browsers and CDNs store them but revalidate before reuse.
+"""
+from datetime import datetime, timezone
+import os
+
+from flask import Response, request
+
+
+def catalog_validators(backend, variant=None):
+    """(etag, last_modified) for the catalog as it is now, or None.
+
+    variant tells apart representations served from the same URL (e.g.
+    NDJSON vs JSON), which must not share an ETag.
+    """
+    state = backend.catalog_version()
+    if state is None:
+        return None
+    version, modified_at = state
+    etag = f'catalog-{version}' + (f'-{variant}' if variant else '')
+    return etag, datetime.fromtimestamp(modified_at, timezone.utc)
+
+
+def not_modified(validators):
+    """A 304 response if the request's validators are current, else None."""
+    if validators is None:
+        return None
+    etag, last_modified = validators
+    if request.if_none_match:
+        fresh = request.if_none_match.contains_weak(etag)
+    elif request.if_modified_since is not None:
+        # HTTP dates have whole seconds.
+        fresh = last_modified.replace(microsecond=0) <= request.if_modified_since
+    else:
+        fresh = False
+    return with_validators(Response(status=304), validators) if fresh else None
+
+
+def with_validators(response, validators):
+    if validators is not None:
+        etag, last_modified = validators
+        response.set_etag(etag)
+        response.last_modified = last_modified
+        response.headers['Cache-Control'] = os.getenv('CATALOG_CACHE_CONTROL', 'no-cache')
+        response.vary.add('Accept')
+    return response
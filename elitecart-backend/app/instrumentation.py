@@ -0,0 +1,157 @@
+"""Per-statement timings for app.database, and the slow-query log.
+
+Every statement the data layer runs is recorded under its name (named
+queries) or SQL text, together with the route that issued it ('GET
+/api/products/<int:product_id>'; '(no request)' outside one). For each
+statement we keep executions, total and max time, rows returned or affected,
+a latency histogram and a per-route breakdown.
+
+Statements slower than SLOW_QUERY_MS (default 200; 0 disables) are logged as
+warnings on the 'elitecart.slow_query' logger, and the most recent ones are
+kept for /api/health/db. With SLOW_QUERY_EXPLAIN=1 the data layer also runs
+EXPLAIN for each slow SELECT/UPDATE/DELETE and the plan is logged with it.
+"""
+from collections import deque
+from threading import Lock
+import json
+import logging
+import os
+
+from flask import has_request_context, request
+
+# Upper bounds in milliseconds; slower executions land in a final '+Inf' bucket.
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+_MAX_TRACKED_STATEMENTS = 256
+_MAX_SLOW_QUERIES = 100
+
+logger = logging.getLogger('elitecart.slow_query')
+
+_lock = Lock()
+_statements = {}
+_slow_queries = deque(maxlen=_MAX_SLOW_QUERIES)
+
+
+def slow_query_seconds():
+    """The slow-query threshold in seconds, or None when the log is off."""
+    ms = float(os.getenv('SLOW_QUERY_MS', 200))
+    return ms / 1000 if ms > 0 else None
+
+
+def wants_plan(sql, seconds):
+    """Whether the caller should EXPLAIN sql, which just took seconds."""
+    threshold = slow_query_seconds()
+    if threshold is None or seconds < threshold or os.getenv('SLOW_QUERY_EXPLAIN', '0') != '1':
+        return False
+    return sql.lstrip()[:6].upper() in ('SELECT', 'UPDATE', 'DELETE')
+
+
+def current_route():
+    if not has_request_context():
+        return '(no request)'
+    rule = request.url_rule
+    return f'{request.method} {rule.rule}' if rule is not None else f'{request.method} (unmatched)'
+
+
+class _StatementStats:
+    __slots__ = ('executions', 'seconds', 'max_seconds', 'rows', 'buckets', 'routes')
+
+    def __init__(self):
+        self.executions = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.rows = 0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        # route -> [executions, seconds]
+        self.routes = {}
+
+
+def _bucket(ms):
+    for index, bound in enumerate(LATENCY_BUCKETS_MS):
+        if ms <= bound:
+            return index
+    return len(LATENCY_BUCKETS_MS)
+
+
+def record(statement, sql, seconds, rows=None, plan=None):
+    """Account one execution of statement (a name or SQL text).
+
+    rows is how many rows it returned or affected, if known; plan is its
+    EXPLAIN output when the caller captured one.
+    """
+    route = current_route()
+    with _lock:
+        stats = _statements.get(statement)
+        if stats is None:
+            if len(_statements) >= _MAX_TRACKED_STATEMENTS:
+                # Ad hoc SQL with a varying number of placeholders would
+                # otherwise grow this without bound.
+                statement = '(other)'
+                stats = _statements.get(statement)
+            if stats is None:
+                stats = _statements[statement] = _StatementStats()
+        stats.executions += 1
+        stats.seconds += seconds
+        if seconds > stats.max_seconds:
+            stats.max_seconds = seconds
+        if rows is not None and rows > 0:
+            stats.rows += rows
+        stats.buckets[_bucket(seconds * 1000)] += 1
+        by_route = stats.routes.get(route)
+        if by_route is None:
+            by_route = stats.routes[route] = [0, 0.0]
+        by_route[0] += 1
+        by_route[1] += seconds
+
+    threshold = slow_query_seconds()
+    if threshold is not None and seconds >= threshold:
+        entry = {
+            'statement': statement,
+            'route': route,
+            'ms': round(seconds * 1000, 3),
+            'rows': rows,
+            'sql': sql,
+        }
+        if plan is not None:
+            entry['plan'] = plan
+        with _lock:
+            _slow_queries.append(entry)
+        # Parameters are left out on purpose: they may hold password hashes.
+        logger.warning('slow query %s', json.dumps(entry, default=str))
+
+
+def statement_stats():
+    """Per-statement totals, histogram and routes, slowest total first."""
+    with _lock:
+        rows = [
+            (statement, stats.executions, stats.seconds, stats.max_seconds, stats.rows,
+             list(stats.buckets), {route: list(totals) for route, totals in stats.routes.items()})
+            for statement, stats in _statements.items()
+        ]
+    rows.sort(key=lambda row: -row[2])
+    bounds = list(LATENCY_BUCKETS_MS) + ['+Inf']
+    return [
+        {
+            'statement': statement,
+            'executions': executions,
+            'total_ms': round(total * 1000, 3),
+            'avg_ms': round(total * 1000 / executions, 3),
+            'max_ms': round(longest * 1000, 3),
+            'rows': rows_seen,
+            'rows_avg': round(rows_seen / executions, 2),
+            # A list rather than a dict, so JSON keeps the buckets in order.
+            'latency_ms': [{'le': bound, 'count': hits} for bound, hits in zip(bounds, buckets)],
+            'routes': {
+                route: {'executions': route_executions, 'total_ms': round(route_total * 1000, 3)}
+                for route, (route_executions, route_total) in sorted(routes.items(), key=lambda item: -item[1][1])
+            },
+        }
+        for statement, executions, total, longest, rows_seen, buckets, routes in rows
+    ]
+
+
+def slow_queries():
+    """The most recent slow queries, newest first."""
+    with _lock:
+        return list(reversed(_slow_queries))
+
@@ -0,0 +1,70 @@
+"""The app's JSON provider: orjson when installed, Flask's encoder otherwise.
+
+Either way SQL values come out as the memory and SQLite backends already
+produce them: DECIMAL columns as numbers, DATETIME columns as ISO 8601 in
+UTC ('2026-01-31T12:00:00Z'); the MySQL driver's naive datetimes are UTC.
+
+orjson serializes dicts, floats and datetimes natively in C and hands
+jsonify() bytes with no str round trip. requirements.txt installs it; the
+fallback only covers environments where it can't be.
+Keys are not sorted, unlike Flask's default.
+"""
+from datetime import date, datetime, timezone
+from decimal import Decimal
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+
+def is_available():
+    return orjson is not None
+
+
+def _default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.astimezone(timezone.utc).isoformat().replace('+00:00', 'Z')
+    if isinstance(value, date):
+        return value.isoformat()
+    return DefaultJSONProvider.default(value)
+
+
+class StandardJSONProvider(DefaultJSONProvider):
+    """Flask's encoder, with the Decimal and datetime output described above."""
+
+    default = staticmethod(_default)
+    sort_keys = False
+
+
+class OrjsonProvider(StandardJSONProvider):
+    """orjson for app.json.dumps/loads and jsonify()."""
+
+    _OPTIONS = orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z if orjson is not None else 0
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            # Options only the stdlib encoder has (indent, cls, ...).
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=_default, option=self._OPTIONS).decode()
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, default=_default, option=self._OPTIONS), mimetype=self.mimetype
+        )
+
+
+def init_app(app):
+    app.json = OrjsonProvider(app) if is_available() else StandardJSONProvider(app)
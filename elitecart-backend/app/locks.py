@@ -0,0 +1,64 @@
+"""Mutexes that record how long callers waited for them.
+
+Used by app.store so lock contention can be read from lock_stats().
+"""
+from threading import Lock
+from time import perf_counter
+
+
+class TimedLock:
+    def __init__(self):
+        self._lock = Lock()
+        self.acquisitions = 0
+        self.contended = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def __enter__(self):
+        if not self._lock.acquire(blocking=False):
+            start = perf_counter()
+            self._lock.acquire()
+            waited = perf_counter() - start
+            # Counters are only touched while holding the lock.
+            self.contended += 1
+            self.wait_seconds += waited
+            if waited > self.max_wait_seconds:
+                self.max_wait_seconds = waited
+        self.acquisitions += 1
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._lock.release()
+
+    def stats(self):
+        return {
+            'acquisitions': self.acquisitions,
+            'contended': self.contended,
+            'wait_ms_total': round(self.wait_seconds * 1000, 3),
+            'wait_ms_max': round(self.max_wait_seconds * 1000, 3),
+        }
+
+
+class StripedLock:
+    """A fixed set of TimedLocks; keys hash onto stripes, so unrelated keys rarely share one."""
+
+    def __init__(self, stripes=64):
+        self._stripes = [TimedLock() for _ in range(stripes)]
+
+    def for_key(self, key):
+        return self._stripes[hash(key) % len(self._stripes)]
+
+    def for_keys(self, keys):
+        """Distinct stripes covering keys, in a fixed order so callers can't deadlock."""
+        indexes = sorted({hash(key) % len(self._stripes) for key in keys})
+        return [self._stripes[i] for i in indexes]
+
+    def stats(self):
+        stats = [lock.stats() for lock in self._stripes]
+        return {
+            'stripes': len(stats),
+            'acquisitions': sum(s['acquisitions'] for s in stats),
+            'contended': sum(s['contended'] for s in stats),
+            'wait_ms_total': round(sum(s['wait_ms_total'] for s in stats), 3),
+            'wait_ms_max': max(s['wait_ms_max'] for s in stats),
+        }
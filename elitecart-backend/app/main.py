@@ -11,10 +11,22 @@ load_dotenv()
 from app.routes.auth import auth_bp
 from app.routes.products import products_bp
 from app.routes.orders import orders_bp
+from app import backends, compression, json_provider
+from app.database import pool_stats, replica_stats
+from app.instrumentation import slow_queries, statement_stats
+from app.pool import PoolTimeout
 
-def create_app():
-    """Create and configure Flask app"""
+def create_app(backend=None):
+    """Create and configure Flask app
+
+    backend is a storage backend or its name ('memory', 'mysql', 'sqlite');
+    by default it comes from STORAGE_BACKEND / USE_IN_MEMORY_STORE.
+    """
     app = Flask(__name__)
+
+    # orjson-backed JSON with Decimal/datetime support, and gzip/brotli
+    json_provider.init_app(app)
+    compression.init_app(app)
     
     # Configure JWT
     app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'your-secret-key-change-in-production')
@@ -26,6 +38,9 @@ def create_app():
     # Enable CORS
     CORS(app, resources={r"/api/*": {"origins": "*"}})
     
+    # Choose the storage backend once; routes use it via get_backend()
+    backend = backends.init_app(app, backend)
+    
     # Register blueprints
     app.register_blueprint(auth_bp)
     app.register_blueprint(products_bp)
@@ -35,6 +50,27 @@ def create_app():
     @app.route('/api/health', methods=['GET'])
     def health_check():
         return jsonify({'status': 'healthy', 'service': 'EliteCart API'}), 200
+
+    # Storage backend in use and its stats (lock contention for memory,
+    # connection pool usage for the SQL backends)
+    @app.route('/api/health/store', methods=['GET'])
+    def store_health():
+        return jsonify({
+            'backend': backend.name,
+            'memory_mode': backend.name == 'memory',
+            **backend.stats(),
+        }), 200
+
+    # MySQL pool usage, replica health, per-statement timings by route and
+    # the most recent slow queries
+    @app.route('/api/health/db', methods=['GET'])
+    def database_health():
+        return jsonify({
+            'pool': pool_stats(),
+            'replicas': replica_stats(),
+            'statements': statement_stats(),
+            'slow_queries': slow_queries(),
+        }), 200
     
     # Error handlers
     @app.errorhandler(404)
@@ -44,6 +80,12 @@ def create_app():
     @app.errorhandler(500)
     def internal_error(error):
         return jsonify({'error': 'Internal server error'}), 500
+
+    # Every pooled connection stayed busy for the whole checkout timeout:
+    # the server is overloaded rather than broken, so ask clients to retry.
+    @app.errorhandler(PoolTimeout)
+    def pool_timeout(error):
+        return jsonify({'error': str(error)}), 503, {'Retry-After': '1'}
     
     return app
 
@@ -0,0 +1,56 @@
+"""Keyset pagination helpers shared by the product and order routes.
+
+Listings are newest first by primary key, so a page is "the next `limit`
+rows whose id is below the last id the client saw". The cursor handed to
+clients is that id, wrapped so they don't depend on its format.
+"""
+import base64
+
+MAX_LIMIT = 100
+_CURSOR_PREFIX = 'k1:'
+
+
+def encode_cursor(last_id):
+    raw = f'{_CURSOR_PREFIX}{int(last_id)}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        if not raw.startswith(_CURSOR_PREFIX):
+            raise ValueError
+        return int(raw[len(_CURSOR_PREFIX):])
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError('Invalid cursor') from None
+
+
+def parse_page_args(args):
+    """Return (limit, after_id) from ?limit=&after=.
+
+    limit is None when the client didn't ask for pagination, which keeps the
+    old return-everything behaviour. Raises ValueError with a client-facing
+    message for bad input.
+    """
+    limit = args.get('limit')
+    after = args.get('after')
+    if limit is None:
+        if after is not None:
+            raise ValueError('after requires limit')
+        return None, None
+    try:
+        limit = int(limit)
+    except ValueError:
+        raise ValueError('limit must be an integer') from None
+    if not 1 <= limit <= MAX_LIMIT:
+        raise ValueError(f'limit must be between 1 and {MAX_LIMIT}')
+    return limit, decode_cursor(after) if after else None
+
+
+def paginate(rows, limit, id_key):
+    """Trim rows fetched with limit + 1 to one page and build the next cursor."""
+    if limit is None or len(rows) <= limit:
+        return rows, None
+    page = rows[:limit]
+    return page, encode_cursor(page[-1][id_key])
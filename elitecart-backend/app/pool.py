@@ -0,0 +1,177 @@
+"""A thread-safe pool of database connections.
+
+Used by app.database. The pool keeps up to `size` idle connections and
+opens up to `max_overflow` extra ones under load; overflow connections are
+closed when they come back instead of being kept. When every connection is
+busy, checkout() waits up to `timeout` seconds for one to be returned.
+
+Connections that sat idle longer than `idle_timeout` are closed rather than
+reused (the server will have dropped them anyway). Ones idle longer than
+`pre_ping_after` are pinged before being handed out; recently used ones are
+trusted, so a busy pool never pays for a round trip per checkout.
+"""
+from collections import deque
+from threading import Condition
+from time import monotonic
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    def __init__(self, connect, ping=None, reset=None, size=5, max_overflow=10,
+                 timeout=30.0, idle_timeout=300.0, pre_ping_after=30.0):
+        self._connect = connect
+        self._ping = ping
+        self._reset = reset
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.pre_ping_after = pre_ping_after
+        self._cond = Condition()
+        # (connection, returned_at); most recently returned on the right.
+        self._idle = deque()
+        self._open = 0
+        self._in_use = 0
+        self._waiters = 0
+        self._closed = False
+        self.checkouts = 0
+        self.timeouts = 0
+        self.created = 0
+        self.discarded = 0
+        self.pings = 0
+        self.checkout_seconds = 0.0
+        self.max_checkout_seconds = 0.0
+
+    def _take_expired(self, now):
+        # Caller holds _cond. The oldest connections sit on the left.
+        expired = []
+        while self._idle and now - self._idle[0][1] > self.idle_timeout:
+            expired.append(self._idle.popleft()[0])
+            self._open -= 1
+        return expired
+
+    def _discard(self, connections):
+        for connection in connections:
+            try:
+                connection.close()
+            except Exception:
+                pass
+        if connections:
+            with self._cond:
+                self.discarded += len(connections)
+
+    def _release_slot(self):
+        with self._cond:
+            self._open -= 1
+            self._in_use -= 1
+            self._cond.notify()
+
+    def checkout(self):
+        start = monotonic()
+        deadline = start + self.timeout
+        with self._cond:
+            if self._closed:
+                raise PoolTimeout('Connection pool is closed')
+            expired = self._take_expired(start)
+            while True:
+                if self._idle:
+                    # LIFO: reuse the warmest connection and let the rest idle out.
+                    connection, returned_at = self._idle.pop()
+                    break
+                if self._open < self.size + self.max_overflow:
+                    connection, returned_at = None, None
+                    self._open += 1
+                    break
+                remaining = deadline - monotonic()
+                if remaining <= 0:
+                    self.timeouts += 1
+                    raise PoolTimeout(f'No database connection available within {self.timeout}s')
+                self._waiters += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self._waiters -= 1
+            self._in_use += 1
+        self._discard(expired)
+
+        # Connecting and pinging happen outside the lock.
+        try:
+            if connection is not None and self._ping is not None \
+                    and monotonic() - returned_at > self.pre_ping_after:
+                with self._cond:
+                    self.pings += 1
+                if not self._ping(connection):
+                    self._discard([connection])
+                    connection = None
+            if connection is None:
+                connection = self._connect()
+                with self._cond:
+                    self.created += 1
+        except Exception:
+            self._release_slot()
+            raise
+
+        waited = monotonic() - start
+        with self._cond:
+            self.checkouts += 1
+            self.checkout_seconds += waited
+            if waited > self.max_checkout_seconds:
+                self.max_checkout_seconds = waited
+        return connection
+
+    def checkin(self, connection):
+        try:
+            if self._reset is not None:
+                self._reset(connection)
+        except Exception:
+            # A connection that can't be reset is in an unknown state.
+            self._discard([connection])
+            self._release_slot()
+            return
+        with self._cond:
+            self._in_use -= 1
+            keep = not self._closed and len(self._idle) < self.size
+            if keep:
+                self._idle.append((connection, monotonic()))
+            else:
+                self._open -= 1
+            self._cond.notify()
+        if not keep:
+            self._discard([connection])
+
+    def discard(self, connection):
+        """Close a checked-out connection instead of returning it, e.g. one
+        left mid-result that would be costly to drain."""
+        self._discard([connection])
+        self._release_slot()
+
+    def close(self):
+        """Close idle connections; ones in use are closed when returned."""
+        with self._cond:
+            self._closed = True
+            idle = [connection for connection, _ in self._idle]
+            self._idle.clear()
+            self._open -= len(idle)
+            self._cond.notify_all()
+        self._discard(idle)
+
+    def stats(self):
+        with self._cond:
+            return {
+                'size': self.size,
+                'max_overflow': self.max_overflow,
+                'open': self._open,
+                'idle': len(self._idle),
+                'in_use': self._in_use,
+                'waiters': self._waiters,
+                'checkouts': self.checkouts,
+                'timeouts': self.timeouts,
+                'created': self.created,
+                'discarded': self.discarded,
+                'pings': self.pings,
+                'checkout_ms_avg': round(self.checkout_seconds * 1000 / self.checkouts, 3) if self.checkouts else 0.0,
+                'checkout_ms_max': round(self.max_checkout_seconds * 1000, 3),
+            }
@@ -0,0 +1,34 @@
+"""Hot statements, registered by name so app.database prepares each one once
+per pooled connection and reports their timings under these names.
+
+Only fixed SQL belongs here; statements whose text changes per call (IN
+lists, optional filters) stay inline in the routes.
+"""
+from app.database import named_query
+
+USER_BY_EMAIL = named_query('user_by_email', 'SELECT * FROM users WHERE email = %s')
+INSERT_USER = named_query('insert_user', 'INSERT INTO users (name, email, password_hash) VALUES (%s, %s, %s)')
+
+PRODUCT_BY_ID = named_query('product_by_id', 'SELECT * FROM products WHERE product_id = %s')
+INSERT_PRODUCT = named_query(
+    'insert_product',
+    'INSERT INTO products (name, description, price, image_url, stock, category) VALUES (%s, %s, %s, %s, %s, %s)',
+)
+DELETE_PRODUCT = named_query('delete_product', 'DELETE FROM products WHERE product_id = %s')
+
+CATALOG_VERSION = named_query(
+    'catalog_version',
+    'SELECT version, UNIX_TIMESTAMP(modified_at) AS modified_at FROM catalog_version WHERE id = 1',
+)
+BUMP_CATALOG_VERSION = named_query(
+    'bump_catalog_version',
+    'UPDATE catalog_version SET version = version + 1, modified_at = CURRENT_TIMESTAMP(6) WHERE id = 1',
+)
+
+ORDER_BY_ID = named_query('order_by_id', 'SELECT * FROM orders WHERE order_id = %s')
+INSERT_ORDER = named_query('insert_order', 'INSERT INTO orders (user_id, total_amount) VALUES (%s, %s)')
+INSERT_ORDER_ITEM = named_query(
+    'insert_order_item',
+    'INSERT INTO order_items (order_id, product_id, quantity, price) VALUES (%s, %s, %s, %s)',
+)
+ORDER_ITEMS_BY_ORDER = named_query('order_items_by_order', 'SELECT * FROM order_items WHERE order_id = %s')
@@ -1,8 +1,6 @@
 from flask import Blueprint, request, jsonify
-from app.database import fetch_one, insert_record
 from app.auth import hash_password, verify_password, create_token
-from app.store import is_memory_mode, find_user_by_email, create_user
-from mysql.connector import Error
+from app.backends import STORAGE_ERRORS, get_backend
 
 auth_bp = Blueprint('auth', __name__, url_prefix='/api/auth')
 
@@ -17,44 +15,25 @@ def signup():
             return jsonify({'error': 'Missing required fields'}), 400
 
         email = data['email'].strip().lower()
+        backend = get_backend()
 
-        if is_memory_mode():
-            existing_user = find_user_by_email(email)
-            if existing_user:
-                return jsonify({'error': 'Email already registered'}), 409
-
-            password_hash = hash_password(data['password'])
-            user = create_user(data['name'], email, password_hash)
-            token = create_token(user['user_id'], user['email'])
-
-            return jsonify({
-                'message': 'User registered successfully',
-                'user_id': user['user_id'],
-                'name': user['name'],
-                'email': user['email'],
-                'access_token': token,
-            }), 201
-
-        existing_user = fetch_one('SELECT * FROM users WHERE email = %s', (email,))
+        existing_user = backend.find_user_by_email(email)
         if existing_user:
             return jsonify({'error': 'Email already registered'}), 409
 
         password_hash = hash_password(data['password'])
-        user_id = insert_record(
-            'INSERT INTO users (name, email, password_hash) VALUES (%s, %s, %s)',
-            (data['name'], email, password_hash),
-        )
-        token = create_token(user_id, email)
+        user = backend.create_user(data['name'], email, password_hash)
+        token = create_token(user['user_id'], user['email'])
 
         return jsonify({
             'message': 'User registered successfully',
-            'user_id': user_id,
-            'name': data['name'],
-            'email': email,
+            'user_id': user['user_id'],
+            'name': user['name'],
+            'email': user['email'],
             'access_token': token,
         }), 201
 
-    except Error as err:
+    except STORAGE_ERRORS as err:
         print(f'Database error in signup: {err}')
         return jsonify({'error': 'Database error: ' + str(err)}), 500
     except Exception as err:
@@ -73,21 +52,7 @@ def login():
 
         email = data['email'].strip().lower()
 
-        if is_memory_mode():
-            user = find_user_by_email(email)
-            if not user or not verify_password(data['password'], user['password_hash']):
-                return jsonify({'error': 'Invalid email or password'}), 401
-
-            token = create_token(user['user_id'], user['email'])
-            return jsonify({
-                'message': 'Login successful',
-                'user_id': user['user_id'],
-                'name': user['name'],
-                'email': user['email'],
-                'access_token': token,
-            }), 200
-
-        user = fetch_one('SELECT * FROM users WHERE email = %s', (email,))
+        user = get_backend().find_user_by_email(email)
 
         if not user or not verify_password(data['password'], user['password_hash']):
             return jsonify({'error': 'Invalid email or password'}), 401
@@ -102,5 +67,5 @@ def login():
             'access_token': token,
         }), 200
 
-    except Error as err:
+    except STORAGE_ERRORS as err:
         return jsonify({'error': str(err)}), 500
\ No newline at end of file
@@ -1,17 +1,7 @@
 from flask import Blueprint, request, jsonify
-from app.database import fetch_one, fetch_all, insert_record, update_record
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from app.store import (
-    is_memory_mode,
-    get_product_by_id,
-    decrement_product_stock,
-    create_order as mem_create_order,
-    create_order_item as mem_create_order_item,
-    get_orders_by_user,
-    get_order_by_id,
-    get_order_items,
-)
-from mysql.connector import Error
+from app.backends import STORAGE_ERRORS, OrderError, get_backend
+from app.pagination import parse_page_args, paginate
 
 orders_bp = Blueprint('orders', __name__, url_prefix='/api/orders')
 
@@ -32,9 +22,6 @@ def create_order():
         if not data or not data.get('items') or len(data['items']) == 0:
             return jsonify({'error': 'No items in order'}), 400
 
-        total_amount = 0
-        order_items = []
-
         for item in data['items']:
             product_id = item.get('product_id')
             quantity = item.get('quantity')
@@ -42,63 +29,23 @@ def create_order():
             if not product_id or not quantity or quantity <= 0:
                 return jsonify({'error': 'Invalid item data'}), 400
 
-            if is_memory_mode():
-                product = get_product_by_id(int(product_id))
-                if not product:
-                    return jsonify({'error': f'Product {product_id} not found'}), 404
-                if int(product['stock']) < int(quantity):
-                    return jsonify({'error': f'Insufficient stock for product {product_id}'}), 400
-                total_amount += float(product['price']) * int(quantity)
-                order_items.append({
-                    'product_id': int(product_id),
-                    'quantity': int(quantity),
-                    'price': float(product['price']),
-                })
-            else:
-                product = fetch_one('SELECT * FROM products WHERE product_id = %s', (product_id,))
-                if not product:
-                    return jsonify({'error': f'Product {product_id} not found'}), 404
-
-                if product['stock'] < quantity:
-                    return jsonify({'error': f'Insufficient stock for product {product_id}'}), 400
-
-                total_amount += product['price'] * quantity
-                order_items.append({
-                    'product_id': product_id,
-                    'quantity': quantity,
-                    'price': product['price'],
-                })
-
-        if is_memory_mode():
-            order = mem_create_order(user_id, total_amount)
-            for item in order_items:
-                mem_create_order_item(order['order_id'], item['product_id'], item['quantity'], item['price'])
-                decrement_product_stock(item['product_id'], item['quantity'])
-            return jsonify({
-                'message': 'Order created successfully',
-                'order_id': order['order_id'],
-                'total_amount': total_amount,
-                'items_count': len(order_items),
-            }), 201
-
-        order_id = insert_record('INSERT INTO orders (user_id, total_amount) VALUES (%s, %s)', (user_id, total_amount))
-
-        for item in order_items:
-            insert_record(
-                'INSERT INTO order_items (order_id, product_id, quantity, price) VALUES (%s, %s, %s, %s)',
-                (order_id, item['product_id'], item['quantity'], item['price']),
-            )
-
-            update_record('UPDATE products SET stock = stock - %s WHERE product_id = %s', (item['quantity'], item['product_id']))
+        # Validation, pricing, stock reservation and the order rows are all
+        # one atomic operation in every backend.
+        try:
+            order = get_backend().place_order(user_id, data['items'])
+        except OrderError as err:
+            if err.reason == 'not_found':
+                return jsonify({'error': f'Product {err.product_id} not found'}), 404
+            return jsonify({'error': f'Insufficient stock for product {err.product_id}'}), 400
 
         return jsonify({
             'message': 'Order created successfully',
-            'order_id': order_id,
-            'total_amount': total_amount,
-            'items_count': len(order_items),
+            'order_id': order['order_id'],
+            'total_amount': order['total_amount'],
+            'items_count': len(order['items']),
         }), 201
 
-    except Error as err:
+    except STORAGE_ERRORS as err:
         return jsonify({'error': str(err)}), 500
 
 
@@ -116,24 +63,19 @@ def get_user_orders(user_id):
         if current_user_id != user_id:
             return jsonify({'error': 'Unauthorized'}), 403
 
-        if is_memory_mode():
-            orders = get_orders_by_user(user_id)
-            for order in orders:
-                order['items'] = get_order_items(order['order_id'])
-            return jsonify({'orders': orders, 'count': len(orders)}), 200
-
-        orders = fetch_all('SELECT * FROM orders WHERE user_id = %s ORDER BY created_at DESC', (user_id,))
-
-        if not orders:
-            return jsonify({'orders': [], 'count': 0}), 200
+        try:
+            limit, after_id = parse_page_args(request.args)
+        except ValueError as err:
+            return jsonify({'error': str(err)}), 400
+        # One extra row tells us whether there is a next page.
+        fetch_limit = limit + 1 if limit else None
 
-        for order in orders:
-            items = fetch_all('SELECT * FROM order_items WHERE order_id = %s', (order['order_id'],))
-            order['items'] = items
+        orders = get_backend().get_orders_by_user(user_id, fetch_limit, after_id)
+        orders, next_cursor = paginate(orders, limit, 'order_id')
 
-        return jsonify({'orders': orders, 'count': len(orders)}), 200
+        return jsonify({'orders': orders, 'count': len(orders), 'next_cursor': next_cursor}), 200
 
-    except Error as err:
+    except STORAGE_ERRORS as err:
         return jsonify({'error': str(err)}), 500
 
 
@@ -148,16 +90,7 @@ def get_order_details(order_id):
         except Exception:
             pass
 
-        if is_memory_mode():
-            order = get_order_by_id(order_id)
-            if not order:
-                return jsonify({'error': 'Order not found'}), 404
-            if current_user_id != order['user_id']:
-                return jsonify({'error': 'Unauthorized'}), 403
-            order['items'] = get_order_items(order_id)
-            return jsonify(order), 200
-
-        order = fetch_one('SELECT * FROM orders WHERE order_id = %s', (order_id,))
+        order = get_backend().get_order(order_id)
 
         if not order:
             return jsonify({'error': 'Order not found'}), 404
@@ -165,10 +98,7 @@ def get_order_details(order_id):
         if current_user_id != order['user_id']:
             return jsonify({'error': 'Unauthorized'}), 403
 
-        items = fetch_all('SELECT * FROM order_items WHERE order_id = %s', (order_id,))
-        order['items'] = items
-
         return jsonify(order), 200
 
-    except Error as err:
+    except STORAGE_ERRORS as err:
         return jsonify({'error': str(err)}), 500
\ No newline at end of file
@@ -1,18 +1,47 @@
 from flask import Blueprint, request, jsonify
-from app.database import fetch_one, fetch_all, insert_record, update_record, delete_record
 from flask_jwt_extended import jwt_required
-from app.store import (
-    is_memory_mode,
-    list_products,
-    get_product_by_id,
-    create_product as mem_create_product,
-    update_product as mem_update_product,
-    delete_product as mem_delete_product,
-)
-from mysql.connector import Error
+from app import bulk
+from app.backends import PRODUCT_FIELDS, STORAGE_ERRORS, get_backend
+from app.conditional import catalog_validators, not_modified, with_validators
+from app.pagination import MAX_LIMIT, parse_page_args, paginate
+from app.streaming import NDJSON_MIMETYPE, ndjson_lines, stream_lines, stream_rows, wants_ndjson
 
 products_bp = Blueprint('products', __name__, url_prefix='/api/products')
 
+UPDATABLE_FIELDS = ['name', 'description', 'price', 'image_url', 'stock', 'category']
+
+
+def parse_fields(args):
+    """The columns named by ?fields=name,price (plus product_id), or None for all."""
+    value = args.get('fields')
+    if not value:
+        return None
+    requested = {field.strip() for field in value.split(',') if field.strip()}
+    unknown = requested.difference(PRODUCT_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))} (allowed: {', '.join(PRODUCT_FIELDS)})")
+    # product_id always: it is the paging cursor and what clients link with.
+    return tuple(field for field in PRODUCT_FIELDS if field in requested or field == 'product_id')
+
+
+def parse_ids(values):
+    """Distinct product ids, in the order given, from a list of ints or numeric strings."""
+    try:
+        ids = list(dict.fromkeys(int(value) for value in values))
+    except (TypeError, ValueError):
+        raise ValueError('ids must be product ids (integers)')
+    if not 1 <= len(ids) <= MAX_LIMIT:
+        raise ValueError(f'Between 1 and {MAX_LIMIT} ids may be requested at once')
+    return ids
+
+
+def products_by_ids(backend, ids, fields):
+    """The batch lookup response: found products in the order asked for, and the ids that weren't."""
+    found = backend.get_products(ids, fields)
+    products = [found[product_id] for product_id in ids if product_id in found]
+    missing = [product_id for product_id in ids if product_id not in found]
+    return {'products': products, 'count': len(products), 'missing': missing}
+
 
 @products_bp.route('', methods=['GET'])
 def get_products():
@@ -22,36 +51,81 @@ def get_products():
         min_price = request.args.get('min_price', type=float)
         max_price = request.args.get('max_price', type=float)
         in_stock = request.args.get('in_stock', type=bool)
+        try:
+            limit, after_id = parse_page_args(request.args)
+            fields = parse_fields(request.args)
+            ids = parse_ids(request.args['ids'].split(',')) if 'ids' in request.args else None
+        except ValueError as err:
+            return jsonify({'error': str(err)}), 400
+        # One extra row tells us whether there is a next page.
+        fetch_limit = limit + 1 if limit else None
+
+        backend = get_backend()
+        if ids is not None:
+            # ?ids=1,2,3: just those products, in one lookup.
+            validators = catalog_validators(backend)
+            unchanged = not_modified(validators)
+            if unchanged is not None:
+                return unchanged
+            return with_validators(jsonify(products_by_ids(backend, ids, fields)), validators), 200
+
+        validators = catalog_validators(backend, 'ndjson' if limit is None and wants_ndjson() else None)
+        unchanged = not_modified(validators)
+        if unchanged is not None:
+            return unchanged
+
+        products = backend.list_products(category, min_price, max_price, bool(in_stock), fetch_limit, after_id, fields)
+
+        if limit is None:
+            # The whole catalog: stream it rather than holding every row and
+            # the whole response body in memory.
+            return with_validators(stream_rows('products', products, {'next_cursor': None}), validators)
+
+        products, next_cursor = paginate(products, limit, 'product_id')
+
+        response = jsonify({'products': products, 'count': len(products), 'next_cursor': next_cursor})
+        return with_validators(response, validators), 200
+
+    except STORAGE_ERRORS as err:
+        return jsonify({'error': str(err)}), 500
 
-        if is_memory_mode():
-            products = list_products(category, min_price, max_price, bool(in_stock))
-            return jsonify({'products': products, 'count': len(products)}), 200
-
-        query = 'SELECT * FROM products WHERE 1=1'
-        params = []
-
-        if category:
-            query += ' AND category = %s'
-            params.append(category)
 
-        if min_price is not None:
-            query += ' AND price >= %s'
-            params.append(min_price)
+@products_bp.route('/search', methods=['GET'])
+def search_products():
+    """Full-text search over product name and description"""
+    try:
+        query = (request.args.get('q') or '').strip()
+        if not query:
+            return jsonify({'error': 'Missing search query'}), 400
 
-        if max_price is not None:
-            query += ' AND price <= %s'
-            params.append(max_price)
+        limit = request.args.get('limit', default=20, type=int)
+        if not 1 <= limit <= MAX_LIMIT:
+            return jsonify({'error': f'limit must be between 1 and {MAX_LIMIT}'}), 400
 
-        if in_stock:
-            query += ' AND stock > 0'
+        products = get_backend().search_products(query, limit)
 
-        query += ' ORDER BY created_at DESC'
+        return jsonify({'products': products, 'count': len(products)}), 200
 
-        products = fetch_all(query, params if params else None)
+    except STORAGE_ERRORS as err:
+        return jsonify({'error': str(err)}), 500
 
-        return jsonify({'products': products, 'count': len(products)}), 200
 
-    except Error as err:
+@products_bp.route('/batch', methods=['POST'])
+def get_products_batch():
+    """Get many products by id, for a body of {"ids": [...]} too long for a query string"""
+    try:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict) or not isinstance(data.get('ids'), list):
+            return jsonify({'error': 'Expected a JSON body of {"ids": [...]}'}), 400
+        try:
+            ids = parse_ids(data['ids'])
+            fields = parse_fields(request.args)
+        except ValueError as err:
+            return jsonify({'error': str(err)}), 400
+
+        return jsonify(products_by_ids(get_backend(), ids, fields)), 200
+
+    except STORAGE_ERRORS as err:
         return jsonify({'error': str(err)}), 500
 
 
@@ -59,20 +133,25 @@ def get_products():
 def get_product(product_id):
     """Get a specific product by ID"""
     try:
-        if is_memory_mode():
-            product = get_product_by_id(product_id)
-            if not product:
-                return jsonify({'error': 'Product not found'}), 404
-            return jsonify(product), 200
+        try:
+            fields = parse_fields(request.args)
+        except ValueError as err:
+            return jsonify({'error': str(err)}), 400
+
+        backend = get_backend()
+        validators = catalog_validators(backend)
+        unchanged = not_modified(validators)
+        if unchanged is not None:
+            return unchanged
 
-        product = fetch_one('SELECT * FROM products WHERE product_id = %s', (product_id,))
+        product = backend.get_product(product_id, fields)
 
         if not product:
             return jsonify({'error': 'Product not found'}), 404
 
-        return jsonify(product), 200
+        return with_validators(jsonify(product), validators), 200
 
-    except Error as err:
+    except STORAGE_ERRORS as err:
         return jsonify({'error': str(err)}), 500
 
 
@@ -87,18 +166,52 @@ def create_product():
         if not data or not all(field in data for field in required_fields):
             return jsonify({'error': 'Missing required fields'}), 400
 
-        if is_memory_mode():
-            product = mem_create_product(data)
-            return jsonify({'message': 'Product created successfully', 'product_id': product['product_id']}), 201
-
-        product_id = insert_record(
-            'INSERT INTO products (name, description, price, image_url, stock, category) VALUES (%s, %s, %s, %s, %s, %s)',
-            (data['name'], data['description'], data['price'], data['image_url'], data['stock'], data['category']),
-        )
+        product_id = get_backend().create_product(data)
 
         return jsonify({'message': 'Product created successfully', 'product_id': product_id}), 201
 
-    except Error as err:
+    except STORAGE_ERRORS as err:
+        return jsonify({'error': str(err)}), 500
+
+
+@products_bp.route('/bulk', methods=['POST'])
+@jwt_required()
+def bulk_create_products():
+    """Import products from an NDJSON or CSV upload (Admin only)"""
+    if request.mimetype == NDJSON_MIMETYPE:
+        records = bulk.ndjson_records(request.stream)
+    elif request.mimetype == bulk.CSV_MIMETYPE:
+        records = bulk.csv_records(request.stream)
+    else:
+        return jsonify({'error': f'Send {NDJSON_MIMETYPE} or {bulk.CSV_MIMETYPE}'}), 415
+
+    backend = get_backend()
+    report = bulk.ImportReport()
+    try:
+        for batch in bulk.validated_batches(records, report):
+            report.created += backend.create_products(batch)
+    except STORAGE_ERRORS as err:
+        # Earlier batches are committed; report how far the import got.
+        return jsonify({'error': str(err), **report.to_dict()}), 500
+
+    if not report.created and report.rejected:
+        return jsonify({'error': 'No valid products to import', **report.to_dict()}), 400
+    return jsonify({'message': 'Products imported', **report.to_dict()}), 201
+
+
+@products_bp.route('/export', methods=['GET'])
+def export_products():
+    """Stream the whole catalog as NDJSON (default) or CSV (?format=csv)"""
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in ('ndjson', 'csv'):
+        return jsonify({'error': 'format must be ndjson or csv'}), 400
+    try:
+        products = get_backend().list_products()
+        if export_format == 'csv':
+            return stream_lines(bulk.csv_lines(products), bulk.CSV_MIMETYPE, 'products.csv')
+        return stream_lines(ndjson_lines(products), NDJSON_MIMETYPE, 'products.ndjson')
+
+    except STORAGE_ERRORS as err:
         return jsonify({'error': str(err)}), 500
 
 
@@ -108,37 +221,19 @@ def update_product(product_id):
     """Update a product (Admin only)"""
     try:
         data = request.get_json() or {}
+        backend = get_backend()
 
-        if is_memory_mode():
-            product = mem_update_product(product_id, data)
-            if not product:
+        if not any(field in data for field in UPDATABLE_FIELDS):
+            if not backend.get_product(product_id):
                 return jsonify({'error': 'Product not found'}), 404
-            return jsonify({'message': 'Product updated successfully', 'product_id': product_id}), 200
-
-        product = fetch_one('SELECT * FROM products WHERE product_id = %s', (product_id,))
-        if not product:
-            return jsonify({'error': 'Product not found'}), 404
-
-        update_fields = []
-        params = []
-
-        updatable_fields = ['name', 'description', 'price', 'image_url', 'stock', 'category']
-        for field in updatable_fields:
-            if field in data:
-                update_fields.append(f'{field} = %s')
-                params.append(data[field])
-
-        if not update_fields:
             return jsonify({'error': 'No fields to update'}), 400
 
-        params.append(product_id)
-        query = f"UPDATE products SET {', '.join(update_fields)} WHERE product_id = %s"
-
-        update_record(query, params)
+        if not backend.update_product(product_id, data):
+            return jsonify({'error': 'Product not found'}), 404
 
         return jsonify({'message': 'Product updated successfully', 'product_id': product_id}), 200
 
-    except Error as err:
+    except STORAGE_ERRORS as err:
         return jsonify({'error': str(err)}), 500
 
 
@@ -147,19 +242,10 @@ def update_product(product_id):
 def delete_product(product_id):
     """Delete a product (Admin only)"""
     try:
-        if is_memory_mode():
-            deleted = mem_delete_product(product_id)
-            if not deleted:
-                return jsonify({'error': 'Product not found'}), 404
-            return jsonify({'message': 'Product deleted successfully'}), 200
-
-        product = fetch_one('SELECT * FROM products WHERE product_id = %s', (product_id,))
-        if not product:
+        if not get_backend().delete_product(product_id):
             return jsonify({'error': 'Product not found'}), 404
 
-        delete_record('DELETE FROM products WHERE product_id = %s', (product_id,))
-
         return jsonify({'message': 'Product deleted successfully'}), 200
 
-    except Error as err:
-        return jsonify({'error': str(err)}), 500
\ No newline at end of file
+    except STORAGE_ERRORS as err:
+        return jsonify({'error': str(err)}), 500
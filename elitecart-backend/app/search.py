@@ -0,0 +1,100 @@
+"""Inverted index with prefix matching and BM25 ranking for product search.
+
+Used by app.store in memory mode. Products are indexed on name and
+description; name tokens are counted twice so title matches rank higher.
+Every query token also matches indexed terms that start with it, so partial
+words work while the user is still typing.
+
+Writers must be serialized by the caller (app.store holds _catalog_lock).
+search() only uses single atomic container operations (dict.get, dict.copy,
+list slices), so it can run concurrently with a writer; app.store retries it
+if the catalog changed mid-query.
+"""
+from bisect import bisect_left, insort
+from collections import Counter
+import math
+import re
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+_MIN_PREFIX = 2
+_K1 = 1.2
+_B = 0.75
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall((text or '').lower())
+
+
+def _document_terms(product):
+    return tokenize(product['name']) * 2 + tokenize(product['description'])
+
+
+class SearchIndex:
+    def __init__(self):
+        self._postings = {}
+        self._vocabulary = []
+        self._doc_lengths = {}
+        self._total_length = 0
+
+    def add(self, product):
+        terms = Counter(_document_terms(product))
+        doc_id = product['product_id']
+        for term, frequency in terms.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = {}
+                insort(self._vocabulary, term)
+            postings[doc_id] = frequency
+        length = sum(terms.values())
+        self._doc_lengths[doc_id] = length
+        self._total_length += length
+
+    def remove(self, product):
+        doc_id = product['product_id']
+        for term in set(_document_terms(product)):
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            postings.pop(doc_id, None)
+            if not postings:
+                del self._postings[term]
+                idx = bisect_left(self._vocabulary, term)
+                if idx < len(self._vocabulary) and self._vocabulary[idx] == term:
+                    del self._vocabulary[idx]
+        self._total_length -= self._doc_lengths.pop(doc_id, 0)
+
+    def _expand(self, token):
+        if len(token) < _MIN_PREFIX:
+            return [token]
+        start = bisect_left(self._vocabulary, token)
+        # Every term with this prefix sorts before token + U+FFFF.
+        end = bisect_left(self._vocabulary, token + '\uffff')
+        return self._vocabulary[start:end] or [token]
+
+    def search(self, query, limit=20):
+        """Return up to limit (product_id, score) pairs, best first."""
+        doc_count = len(self._doc_lengths)
+        if not doc_count:
+            return []
+        average_length = (self._total_length / doc_count) or 1
+        scores = {}
+        for token in set(tokenize(query)):
+            # A document matching several expansions of one token scores
+            # its best one, so short prefixes don't outrank exact words.
+            best = {}
+            for term in self._expand(token):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                postings = postings.copy()
+                idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, frequency in postings.items():
+                    length = self._doc_lengths.get(doc_id, average_length)
+                    norm = frequency + _K1 * (1 - _B + _B * length / average_length)
+                    score = idf * frequency * (_K1 + 1) / norm
+                    if score > best.get(doc_id, 0):
+                        best[doc_id] = score
+            for doc_id, score in best.items():
+                scores[doc_id] = scores.get(doc_id, 0) + score
+        ranked = sorted(scores.items(), key=lambda pair: (-pair[1], -pair[0]))
+        return ranked[:limit]
@@ -0,0 +1,182 @@
+"""Stock counters and id sequences shared by every worker process on a host.
+
+Used by app.store when STORE_SHARED_MEMORY names a shared memory segment.
+The segment is an array of int64 slots:
+
+    [0]               1 once the first process has seeded it
+    [1..4]            next id for users, products, orders, order_items
+    [5]               stock version, bumped after every stock change
+    [6]               time of the last stock change (ns since the epoch)
+    [8 + product_id]  stock for product_id
+
+Cross-process mutual exclusion uses POSIX record locks (fcntl.lockf) on one
+byte per slot of a lock file, so each product has its own lock and workers
+only contend when they touch the same product. Record locks are owned by the
+process, not the thread, so each one is paired with an in-process lock.
+"""
+from contextlib import ExitStack
+from multiprocessing import shared_memory
+from threading import Lock
+import atexit
+import fcntl
+import os
+import tempfile
+import time
+
+from app.locks import StripedLock
+
+_INITIALIZED_SLOT = 0
+_SEQUENCE_SLOTS = {'users': 1, 'products': 2, 'orders': 3, 'order_items': 4}
+_STOCK_VERSION_SLOT = 5
+_STOCK_MODIFIED_SLOT = 6
+_STOCK_BASE = 8
+_SLOT_BYTES = 8
+
+
+def _open_segment(name, create, size):
+    try:
+        return shared_memory.SharedMemory(name=name, create=create, size=size, track=False)
+    except TypeError:  # Python < 3.13 has no track flag
+        segment = shared_memory.SharedMemory(name=name, create=create, size=size)
+        # Otherwise the resource tracker unlinks the segment when this
+        # worker exits, and a respawned worker would start a fresh one.
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(segment._name, 'shared_memory')
+        return segment
+
+
+def _attach(name, size):
+    """Open the named segment, creating it if this is the first process.
+
+    The segment deliberately outlives every worker; unlink it (for example
+    rm /dev/shm/<name>) to reset stock and sequences.
+    """
+    try:
+        return _open_segment(name, True, size)
+    except FileExistsError:
+        return _open_segment(name, False, 0)
+
+
+class SharedCounters:
+    def __init__(self, name, max_products=1000000):
+        self.max_products = max_products
+        self._segment = _attach(name, (_STOCK_BASE + max_products + 1) * _SLOT_BYTES)
+        self._slots = self._segment.buf.cast('q')
+        lock_path = os.path.join(tempfile.gettempdir(), f'{name}.lock')
+        self._lock_fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+        self._sequence_locks = {sequence: Lock() for sequence in _SEQUENCE_SLOTS}
+        self._init_lock = Lock()
+        self._version_lock = Lock()
+        self._stock_locks = StripedLock()
+        atexit.register(self.close)
+
+    def close(self):
+        self._slots.release()
+        self._segment.close()
+        os.close(self._lock_fd)
+
+    def _locked(self, slot):
+        return _RecordLock(self._lock_fd, slot)
+
+    def has_product(self, product_id):
+        return 0 < product_id <= self.max_products
+
+    def initialize_once(self, seed):
+        """Call seed(self) in exactly one process per segment; returns True there."""
+        with self._init_lock, self._locked(_INITIALIZED_SLOT):
+            if self._slots[_INITIALIZED_SLOT]:
+                return False
+            for slot in _SEQUENCE_SLOTS.values():
+                self._slots[slot] = 1
+            seed(self)
+            self._slots[_INITIALIZED_SLOT] = 1
+            return True
+
+    def next_id(self, sequence):
+        slot = _SEQUENCE_SLOTS[sequence]
+        with self._sequence_locks[sequence], self._locked(slot):
+            value = self._slots[slot]
+            self._slots[slot] = value + 1
+            return value
+
+    def peek_id(self, sequence):
+        """The value next_id(sequence) would return, without taking it."""
+        slot = _SEQUENCE_SLOTS[sequence]
+        with self._sequence_locks[sequence], self._locked(slot):
+            return self._slots[slot]
+
+    def set_next_id(self, sequence, value):
+        slot = _SEQUENCE_SLOTS[sequence]
+        with self._sequence_locks[sequence], self._locked(slot):
+            self._slots[slot] = max(self._slots[slot], value)
+
+    def _stock_changed(self):
+        # After the stock slots are written, so a reader that sees the new
+        # version also sees the change. Locked: a lost increment could leave
+        # a change with no new version.
+        with self._version_lock, self._locked(_STOCK_VERSION_SLOT):
+            self._slots[_STOCK_VERSION_SLOT] += 1
+            self._slots[_STOCK_MODIFIED_SLOT] = time.time_ns()
+
+    def stock_version(self):
+        """(version, last change in epoch seconds) of stock across all processes."""
+        return self._slots[_STOCK_VERSION_SLOT], self._slots[_STOCK_MODIFIED_SLOT] / 1e9
+
+    def get_stock(self, product_id):
+        # An aligned 8-byte load; never torn, so no lock is needed.
+        return self._slots[_STOCK_BASE + product_id]
+
+    def set_stock(self, product_id, stock):
+        slot = _STOCK_BASE + product_id
+        with self._stock_locks.for_key(product_id), self._locked(slot):
+            self._slots[slot] = stock
+        self._stock_changed()
+
+    def decrement_stock(self, product_id, quantity):
+        """Atomically take quantity units across all processes.
+
+        Returns the remaining stock, or None if there wasn't enough.
+        """
+        slot = _STOCK_BASE + product_id
+        with self._stock_locks.for_key(product_id), self._locked(slot):
+            stock = self._slots[slot]
+            if stock < quantity:
+                return None
+            self._slots[slot] = stock - quantity
+        self._stock_changed()
+        return stock - quantity
+
+    def reserve(self, quantities):
+        """Take every {product_id: quantity} at once, or nothing.
+
+        Returns (None, {product_id: remaining stock}) on success, or
+        (short_product_id, None) when nothing was taken.
+        """
+        product_ids = sorted(quantities)
+        with ExitStack() as stack:
+            for lock in self._stock_locks.for_keys(product_ids):
+                stack.enter_context(lock)
+            for product_id in product_ids:
+                stack.enter_context(self._locked(_STOCK_BASE + product_id))
+            for product_id in product_ids:
+                if self._slots[_STOCK_BASE + product_id] < quantities[product_id]:
+                    return product_id, None
+            remaining = {}
+            for product_id in product_ids:
+                slot = _STOCK_BASE + product_id
+                self._slots[slot] -= quantities[product_id]
+                remaining[product_id] = self._slots[slot]
+        self._stock_changed()
+        return None, remaining
+
+
+class _RecordLock:
+    def __init__(self, fd, slot):
+        self._fd = fd
+        self._slot = slot
+
+    def __enter__(self):
+        fcntl.lockf(self._fd, fcntl.LOCK_EX, 1, self._slot)
+
+    def __exit__(self, exc_type, exc, tb):
+        fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, self._slot)
@@ -1,19 +1,144 @@
+from bisect import bisect_left, bisect_right, insort
 from datetime import datetime
-from threading import RLock
+from contextlib import ExitStack, contextmanager
+from threading import Lock, Thread
+from time import sleep, time
 import os
 
-_store_lock = RLock()
+from app import catalog, persistence, search
+from app.locks import StripedLock, TimedLock
+
+# Rows are copy-on-write: once a dict is stored here it is never mutated.
+# Writers build a replacement dict and publish it, so readers can hand out
+# the stored rows without copying them. Callers must treat returned rows as
+# read-only and build new dicts if they need to add keys.
+#
+# Locking. Writers take fine-grained locks:
+#   _catalog_lock      product create/update/delete and the catalog indexes
+#   _stock_locks       one stripe per product id; decrement_product_stock takes
+#                      only this, so checkouts on different products run in
+#                      parallel. update/delete take it too (after _catalog_lock).
+#   _order_locks       one stripe per user id, so a user's orders are appended
+#                      to _orders_by_user in id order
+# place_order holds the stock stripes of every product in the cart (in stripe
+# order) plus the user's order stripe, so a whole checkout is one critical
+# section. Lock order is always catalog -> stock -> orders.
+#   _user_lock         create_user
+#
+# Readers take no locks. They rely on CPython's GIL making single container
+# operations (dict.get, list slicing, set copies/intersections) atomic, and on
+# rows being immutable, so a reader sees each row either before or after a
+# write, never half-applied. The catalog indexes need several operations per
+# query, so list_products reads them optimistically: writers bump
+# _catalog_seq to an odd value while they mutate the indexes and publish the
+# rows, and back to even when done, and a reader that saw the sequence change
+# simply retries. Readers look the rows up inside that retry loop too, so a
+# row always matches the index entries that found it.
+_init_lock = Lock()
+_catalog_lock = TimedLock()
+_stock_locks = StripedLock()
+_order_locks = StripedLock()
+_user_lock = TimedLock()
+_catalog_seq = 0
 _initialized = False
 
-_users = []
-_products = []
-_orders = []
-_order_items = []
-
-_next_user_id = 1
-_next_product_id = 1
-_next_order_id = 1
-_next_order_item_id = 1
+# Primary-key indexes. Dicts keep insertion order, so iterating them still
+# yields rows in creation order like the old lists did.
+_users = {}
+_products = {}
+_orders = {}
+_order_items = {}
+
+# Secondary indexes, maintained by the create/update/delete functions below.
+_users_by_email = {}
+_orders_by_user = {}
+_items_by_order = {}
+
+# Catalog indexes used by list_products: category -> set of product ids,
+# (price, product_id) pairs kept sorted for bisect range queries, and the ids
+# of products that currently have stock.
+_products_by_category = {}
+_price_index = []
+_in_stock_ids = set()
+
+
+def _create_columnar_catalog():
+    if os.getenv('STORE_COLUMNAR_CATALOG') != '1':
+        return None
+    if not catalog.is_available():
+        print('STORE_COLUMNAR_CATALOG=1 but numpy is not installed; using dict indexes')
+        return None
+    return catalog.ColumnarCatalog()
+
+
+# When enabled, the columnar catalog replaces the category/price/stock indexes
+# above for list_products.
+_columnar_catalog = _create_columnar_catalog()
+
+# Full-text index over product name and description for search_products.
+_search_index = search.SearchIndex()
+
+# Bumped by every product write. The newest-first tuple of all products is
+# cached as (version, rows) so unfiltered listings don't rebuild or sort
+# anything while the catalog is unchanged.
+_catalog_version = 0
+_catalog_modified_at = time()
+_catalog_version_lock = Lock()
+_catalog_snapshot = None
+
+class _Sequence:
+    """An id counter whose next value can be read without taking it."""
+
+    def __init__(self, start=1):
+        self._lock = Lock()
+        self._next = start
+
+    def __next__(self):
+        with self._lock:
+            value = self._next
+            self._next = value + 1
+            return value
+
+    def peek(self):
+        return self._next
+
+
+# Id sequences per table.
+_id_sequences = {
+    'users': _Sequence(),
+    'products': _Sequence(),
+    'orders': _Sequence(),
+    'order_items': _Sequence(),
+}
+
+
+def _open_shared_counters():
+    name = os.getenv('STORE_SHARED_MEMORY')
+    if not name:
+        return None
+    from app import shared  # POSIX only (fcntl), so imported on demand
+    return shared.SharedCounters(name, int(os.getenv('STORE_SHARED_MAX_PRODUCTS', 1000000)))
+
+
+# Optional cross-process state (see app.shared). With STORE_SHARED_MEMORY set,
+# id sequences and product stock live in shared memory, so every worker on
+# the host allocates distinct ids and sells from the same stock. Product
+# rows, users and orders themselves remain per process.
+_shared = _open_shared_counters()
+
+# Optional durability (see app.persistence). With STORE_DATA_DIR set, every
+# mutation is logged inside the same lock that orders it in memory, after it
+# has been applied, and the caller waits for the group-commit fsync once the
+# lock is released. STORE_WAL_SYNC=0 skips that wait.
+_data_dir = os.getenv('STORE_DATA_DIR')
+if _data_dir and _shared is not None:
+    # Several workers appending to one log would interleave and corrupt it.
+    print('STORE_DATA_DIR is not supported together with STORE_SHARED_MEMORY; persistence disabled')
+    _data_dir = None
+_wal_sync = os.getenv('STORE_WAL_SYNC', '1') != '0'
+_snapshot_every = int(os.getenv('STORE_SNAPSHOT_EVERY', 100000))
+_snapshot_lock = Lock()
+_wal = None
 
 
 def is_memory_mode():
@@ -25,7 +150,7 @@ def _now():
     return datetime.utcnow().isoformat() + 'Z'
 
 
-def _seed_products():
+def seed_products():
     return [
         {
             'name': 'Premium Sneaker',
@@ -94,159 +219,752 @@ def _seed_products():
     ]
 
 
+def _index_product(product):
+    _search_index.add(product)
+    if _columnar_catalog is not None:
+        _columnar_catalog.upsert(product)
+        return
+    product_id = product['product_id']
+    _products_by_category.setdefault(product['category'], set()).add(product_id)
+    insort(_price_index, (product['price'], product_id))
+    if product['stock'] > 0:
+        _in_stock_ids.add(product_id)
+
+
+def _unindex_product(product):
+    _search_index.remove(product)
+    if _columnar_catalog is not None:
+        # Columns are overwritten in place by _index_product; rows are only
+        # dropped by delete_product.
+        return
+    product_id = product['product_id']
+    bucket = _products_by_category.get(product['category'])
+    if bucket is not None:
+        bucket.discard(product_id)
+        if not bucket:
+            del _products_by_category[product['category']]
+    key = (product['price'], product_id)
+    idx = bisect_left(_price_index, key)
+    if idx < len(_price_index) and _price_index[idx] == key:
+        del _price_index[idx]
+    _in_stock_ids.discard(product_id)
+
+
+def _next_id(table):
+    if _shared is not None:
+        return _shared.next_id(table)
+    return next(_id_sequences[table])
+
+
+def _peek_next_id(table):
+    """The id _next_id(table) would return next, without allocating it."""
+    if _shared is not None:
+        return _shared.peek_id(table)
+    return _id_sequences[table].peek()
+
+
+def _with_shared_stock(product):
+    """Return product with its stock refreshed from shared memory.
+
+    Other workers' sales only show up in the shared counter, so the local row
+    is republished (without logging) whenever the two have drifted apart.
+    """
+    if product is None or _shared is None or not _shared.has_product(product['product_id']):
+        return product
+    product_id = product['product_id']
+    if _shared.get_stock(product_id) == product['stock']:
+        return product
+    with _stock_locks.for_key(product_id):
+        current = _products.get(product_id)
+        stock = _shared.get_stock(product_id)
+        if current is None:
+            return {**product, 'stock': stock}
+        if current['stock'] != stock:
+            current = {**current, 'stock': stock}
+            _publish_product(current)
+        return current
+
+
+def _bump_catalog_version():
+    global _catalog_version, _catalog_modified_at
+    # Writers on different stock stripes can get here concurrently.
+    with _catalog_version_lock:
+        _catalog_version += 1
+        _catalog_modified_at = time()
+
+
+def _publish_product(product):
+    # Publish the row before bumping the version, so a snapshot tagged with
+    # version N always contains every write up to N.
+    _products[product['product_id']] = product
+    _bump_catalog_version()
+
+
+@contextmanager
+def _catalog_write():
+    """Mark the catalog indexes as mid-update for the duration of the block.
+
+    The sequence goes back to even even if the block raises; otherwise
+    _read_catalog would spin forever.
+    """
+    global _catalog_seq
+    _catalog_seq += 1
+    try:
+        yield
+    finally:
+        _catalog_seq += 1
+
+
+def _reindex_product(old, new):
+    """Replace old's catalog index entries with new's; either may be None.
+
+    If indexing new fails, its partial entries are dropped and old's are put
+    back before re-raising, so the indexes still match _products. Caller
+    holds _catalog_lock inside _catalog_write().
+    """
+    if old is not None:
+        _unindex_product(old)
+    try:
+        if new is not None:
+            _index_product(new)
+    except Exception:
+        _unindex_product(new)
+        if _columnar_catalog is not None and old is None:
+            _columnar_catalog.remove(new['product_id'])
+        if old is not None:
+            _index_product(old)
+        raise
+
+
+def _price_range_ids(min_price, max_price):
+    lo = 0 if min_price is None else bisect_left(_price_index, (float(min_price), 0))
+    hi = len(_price_index) if max_price is None else bisect_right(_price_index, (float(max_price), float('inf')))
+    return {product_id for _, product_id in _price_index[lo:hi]}
+
+
+def _filter_product_ids(category, min_price, max_price, in_stock):
+    if _columnar_catalog is not None:
+        return _columnar_catalog.filter_ids(category, min_price, max_price, in_stock)
+
+    candidates = []
+    if category:
+        candidates.append(_products_by_category.get(category, set()))
+    if min_price is not None or max_price is not None:
+        candidates.append(_price_range_ids(min_price, max_price))
+    if in_stock:
+        candidates.append(_in_stock_ids)
+
+    # Intersect starting from the smallest candidate set so a narrow filter
+    # never touches rows outside its own bucket.
+    candidates.sort(key=len)
+    ids = set(candidates[0])
+    for other in candidates[1:]:
+        ids &= other
+    return sorted(ids, reverse=True)
+
+
+def _all_products_newest_first():
+    global _catalog_snapshot
+    snapshot = _catalog_snapshot
+    version = _catalog_version
+    if snapshot is not None and snapshot[0] == version:
+        return snapshot[1]
+    # dict.copy() is a single atomic operation, unlike iterating the live dict.
+    rows = tuple(reversed(_products.copy().values()))
+    _catalog_snapshot = (version, rows)
+    return rows
+
+
+def lock_stats():
+    """Acquisition and wait-time counters for the store's locks."""
+    return {
+        'catalog': _catalog_lock.stats(),
+        'stock': _stock_locks.stats(),
+        'orders': _order_locks.stats(),
+        'users': _user_lock.stats(),
+    }
+
+
+def _log(table, key, row):
+    """Append a row image (None for a delete) to the WAL; returns 0 when disabled."""
+    if _wal is None:
+        return 0
+    return _wal.append({'t': table, 'id': key, 'row': row})
+
+
+def _wait_durable(seq):
+    if not seq:
+        return
+    if _wal_sync:
+        _wal.wait_durable(seq)
+    if _wal.records_since_snapshot >= _snapshot_every and _snapshot_lock.acquire(blocking=False):
+        Thread(target=_save_snapshot_locked, name='store-snapshot', daemon=True).start()
+
+
+def _save_snapshot_locked():
+    try:
+        first_segment = _wal.rotate()
+        # Everything logged before the rotation is already applied in memory,
+        # so these copies cover it. Later writes are in the new segment and
+        # are replayed over the snapshot on recovery.
+        tables = {
+            'users': _users.copy(),
+            'products': _products.copy(),
+            'orders': _orders.copy(),
+            'order_items': _order_items.copy(),
+            'next_ids': {name: _peek_next_id(name) for name in _TABLES},
+        }
+        persistence.write_snapshot(_data_dir, first_segment, tables)
+    finally:
+        _snapshot_lock.release()
+
+
+def save_snapshot():
+    """Write a snapshot of the whole store and drop the WAL segments it replaces."""
+    initialize_store()
+    if _wal is None:
+        return False
+    _snapshot_lock.acquire()
+    _save_snapshot_locked()
+    return True
+
+
+_TABLES = {
+    'users': _users,
+    'products': _products,
+    'orders': _orders,
+    'order_items': _order_items,
+}
+
+
+def _rebuild_indexes():
+    """Rebuild every secondary index from the primary dicts in one pass each."""
+    global _price_index
+    for table in _TABLES.values():
+        rows = sorted(table.items())
+        table.clear()
+        table.update(rows)
+    _users_by_email.update((u['email'], u) for u in _users.values())
+    for order in _orders.values():
+        _orders_by_user.setdefault(order['user_id'], []).append(order)
+    for item in _order_items.values():
+        _items_by_order.setdefault(item['order_id'], []).append(item)
+    for product in _products.values():
+        _search_index.add(product)
+    if _columnar_catalog is not None:
+        for product in _products.values():
+            _columnar_catalog.upsert(product)
+    else:
+        for product in _products.values():
+            _products_by_category.setdefault(product['category'], set()).add(product['product_id'])
+        _price_index = sorted((p['price'], p['product_id']) for p in _products.values())
+        _in_stock_ids.update(p['product_id'] for p in _products.values() if p['stock'] > 0)
+    _bump_catalog_version()
+
+
+def _recover():
+    """Load the latest snapshot and replay the WAL after it. Returns False
+    if the data directory held nothing to recover."""
+    first_segment, tables = persistence.load_snapshot(_data_dir)
+    next_ids = {name: 1 for name in _TABLES}
+    if tables is not None:
+        for name, table in _TABLES.items():
+            table.update(tables[name])
+        next_ids.update(tables['next_ids'])
+    replayed = 0
+    for record in persistence.read_records(_data_dir, first_segment):
+        table = _TABLES[record['t']]
+        if record['row'] is None:
+            table.pop(record['id'], None)
+        else:
+            table[record['id']] = record['row']
+        # Deleted ids must not be handed out again either.
+        next_ids[record['t']] = max(next_ids[record['t']], record['id'] + 1)
+        replayed += 1
+    for name, table in _TABLES.items():
+        if table:
+            next_ids[name] = max(next_ids[name], max(table) + 1)
+    for name, next_id in next_ids.items():
+        _id_sequences[name] = _Sequence(next_id)
+    _rebuild_indexes()
+    return tables is not None or replayed > 0
+
+
+def _seed_shared_counters(counters):
+    seeds = seed_products()
+    for product_id, p in enumerate(seeds, 1):
+        counters.set_stock(product_id, p['stock'])
+    counters.set_next_id('products', len(seeds) + 1)
+
+
 def initialize_store():
-    global _initialized, _next_product_id
+    global _initialized, _wal
     if _initialized:
         return
-    with _store_lock:
+    with _init_lock:
         if _initialized:
             return
-        for p in _seed_products():
-            create_product(p)
+        recovered = False
+        if _data_dir:
+            os.makedirs(_data_dir, exist_ok=True)
+            recovered = _recover()
+            _wal = persistence.WriteAheadLog(_data_dir)
+        if _shared is not None:
+            # Every worker holds the seed rows locally under the same ids;
+            # only the first one to start writes their stock to shared memory.
+            _shared.initialize_once(_seed_shared_counters)
+            for product_id, p in enumerate(seed_products(), 1):
+                _insert_product(p, product_id)
+        elif not recovered:
+            for p in seed_products():
+                _insert_product(p)
         _initialized = True
 
 
 def find_user_by_email(email):
     initialize_store()
     email_normalized = (email or '').strip().lower()
-    return next((u for u in _users if u['email'].lower() == email_normalized), None)
+    return _users_by_email.get(email_normalized)
 
 
 def get_user_by_id(user_id):
     initialize_store()
-    return next((u for u in _users if u['user_id'] == user_id), None)
+    return _users.get(user_id)
 
 
 def create_user(name, email, password_hash):
-    global _next_user_id
     initialize_store()
-    with _store_lock:
+    with _user_lock:
         user = {
-            'user_id': _next_user_id,
+            'user_id': _next_id('users'),
             'name': name,
             'email': (email or '').strip().lower(),
             'password_hash': password_hash,
             'created_at': _now(),
         }
-        _users.append(user)
-        _next_user_id += 1
-        return user.copy()
+        _users[user['user_id']] = user
+        _users_by_email[user['email']] = user
+        seq = _log('users', user['user_id'], user)
+    _wait_durable(seq)
+    return user
+
+
+def _read_catalog(query, *args):
+    """Run query(*args) against the catalog indexes without locking.
+
+    Retries until no writer touched the indexes while it ran (see the
+    _catalog_seq notes at the top of this module).
+    """
+    while True:
+        seq = _catalog_seq
+        if seq % 2:
+            sleep(0)  # a writer is mid-update; yield so it can finish
+            continue
+        result = query(*args)
+        if _catalog_seq == seq:
+            return result
+
+
+def _keyset_start(rows, after_id, id_of, descending):
+    """Binary search for where a keyset page starts.
+
+    For rows sorted by descending id, returns the first index whose id is
+    below after_id; for ascending rows, the first index at or above it.
+    """
+    lo, hi = 0, len(rows)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        value = id_of(rows[mid])
+        if (value >= after_id) if descending else (value < after_id):
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+def _page_desc(rows, limit, after_id, id_of):
+    start = 0 if after_id is None else _keyset_start(rows, after_id, id_of, True)
+    return rows[start:] if limit is None else rows[start:start + limit]
+
+
+def _project(product, fields):
+    # A new dict with just fields; rows themselves are shared and read-only.
+    if product is None or fields is None:
+        return product
+    return {field: product[field] for field in fields}
+
+
+def list_products(category=None, min_price=None, max_price=None, in_stock=False, limit=None, after_id=None,
+                  fields=None):
+    """Products newest first; with limit/after_id, one keyset page of ids below after_id.
+
+    With fields, each row is a dict of just those columns, built only for the
+    rows on the page.
+    """
+    initialize_store()
+    if _shared is not None:
+        # Other workers' sales aren't in the local in-stock index, so check
+        # stock on the refreshed rows instead, before paging.
+        products = [_with_shared_stock(p) for p in _list_local_products(category, min_price, max_price, False)]
+        if in_stock:
+            products = [p for p in products if p['stock'] > 0]
+        products = _page_desc(products, limit, after_id, lambda p: p['product_id'])
+    else:
+        products = _list_local_products(category, min_price, max_price, in_stock, limit, after_id)
+    if fields is None:
+        return products
+    return [_project(p, fields) for p in products]
+
+
+def _list_local_products(category, min_price, max_price, in_stock, limit=None, after_id=None):
+    if not (category or min_price is not None or max_price is not None or in_stock):
+        return list(_page_desc(_all_products_newest_first(), limit, after_id, lambda p: p['product_id']))
+
+    products = _read_catalog(_filtered_products, category, min_price, max_price, in_stock, limit, after_id)
+    if in_stock:
+        # decrement_product_stock updates the in-stock index without
+        # _catalog_seq, so a row may have sold out since its id was found.
+        products = [p for p in products if p['stock'] > 0]
+    return products
+
+
+def _filtered_products(category, min_price, max_price, in_stock, limit, after_id):
+    # Runs inside _read_catalog, so the rows are the ones the index matched.
+    # A missing row only happens on a read that overlapped a delete, which
+    # _read_catalog throws away and retries.
+    ids = _filter_product_ids(category, min_price, max_price, in_stock)
+    # Page over the bare ids so only the rows being returned are looked up.
+    ids = _page_desc(ids, limit, after_id, int)
+    products = (_products.get(product_id) for product_id in ids)
+    return [p for p in products if p is not None]
+
+
+def _search_products(query, limit):
+    # Runs inside _read_catalog, like _filtered_products.
+    products = (_products.get(product_id) for product_id, _ in _search_index.search(query, limit))
+    return [p for p in products if p is not None]
 
 
-def list_products(category=None, min_price=None, max_price=None, in_stock=False):
+def search_products(query, limit=20):
+    """Products matching query on name/description, best BM25 score first."""
     initialize_store()
-    results = [p.copy() for p in _products]
-    if category:
-        results = [p for p in results if p['category'] == category]
-    if min_price is not None:
-        results = [p for p in results if float(p['price']) >= float(min_price)]
-    if max_price is not None:
-        results = [p for p in results if float(p['price']) <= float(max_price)]
-    if in_stock:
-        results = [p for p in results if int(p['stock']) > 0]
-    results.sort(key=lambda p: p['product_id'], reverse=True)
-    return results
+    return [_with_shared_stock(p) for p in _read_catalog(_search_products, query, limit)]
+
+
+def catalog_version():
+    """Monotonic counter bumped by every product create/update/delete and stock change."""
+    return _catalog_version
+
+
+def catalog_validators():
+    """(version tag, last change in epoch seconds) for conditional GETs.
+
+    With shared memory, stock sold by other workers only reaches this
+    worker's rows when they are next read, so the shared stock version is
+    part of the tag too.
+    """
+    initialize_store()
+    version, modified_at = str(_catalog_version), _catalog_modified_at
+    if _shared is not None:
+        stock_version, stock_modified_at = _shared.stock_version()
+        version = f'{version}.{stock_version}'
+        modified_at = max(modified_at, stock_modified_at)
+    return version, modified_at
+
+
+def get_product_by_id(product_id, fields=None):
+    initialize_store()
+    return _project(_with_shared_stock(_products.get(product_id)), fields)
 
 
-def get_product_by_id(product_id):
+def get_products_by_ids(product_ids, fields=None):
+    """{product_id: product} for those of product_ids that exist."""
     initialize_store()
-    product = next((p for p in _products if p['product_id'] == product_id), None)
-    return product.copy() if product else None
+    products = {}
+    for product_id in product_ids:
+        product = _products.get(product_id)
+        if product is not None:
+            products[product_id] = _project(_with_shared_stock(product), fields)
+    return products
 
 
 def create_product(data):
-    global _next_product_id
-    with _store_lock:
-        product = {
-            'product_id': _next_product_id,
-            'name': data['name'],
-            'description': data['description'],
-            'price': float(data['price']),
-            'image_url': data['image_url'],
-            'stock': int(data['stock']),
-            'category': data['category'],
-            'created_at': _now(),
-        }
-        _products.append(product)
-        _next_product_id += 1
-        return product.copy()
+    initialize_store()
+    return _insert_product(data)
+
+
+def create_products(rows):
+    """Insert many products under a single catalog lock acquisition.
+
+    Readers see the whole batch appear at once, and with a synchronous WAL
+    the batch waits for one fsync instead of one per row. Returns the ids.
+    """
+    initialize_store()
+    product_ids = []
+    seq = 0
+    with _catalog_lock:
+        products = [_new_product(data) for data in rows]
+        if not products:
+            return product_ids
+        with _catalog_write():
+            indexed = []
+            try:
+                for product in products:
+                    _reindex_product(None, product)
+                    indexed.append(product)
+            except Exception:
+                for product in indexed:
+                    _reindex_product(product, None)
+                    if _columnar_catalog is not None:
+                        _columnar_catalog.remove(product['product_id'])
+                raise
+            for product in products:
+                _products[product['product_id']] = product
+        for product in products:
+            seq = _log('products', product['product_id'], product)
+            product_ids.append(product['product_id'])
+        _bump_catalog_version()
+    _wait_durable(seq)
+    return product_ids
+
+
+def _text(value):
+    # Text columns are indexed (category is a dict key, name and description
+    # are tokenized), so coerce them like price and stock before any index
+    # sees them.
+    return None if value is None else str(value)
+
+
+def _new_product(data, product_id=None):
+    # Caller holds _catalog_lock.
+    product = {
+        'product_id': product_id or _next_id('products'),
+        'name': _text(data['name']),
+        'description': _text(data['description']),
+        'price': float(data['price']),
+        'image_url': _text(data['image_url']),
+        'stock': int(data['stock']),
+        'category': _text(data['category']),
+        'created_at': _now(),
+    }
+    if _shared is not None and product_id is None and _shared.has_product(product['product_id']):
+        _shared.set_stock(product['product_id'], product['stock'])
+    return product
+
+
+def _insert_product(data, product_id=None):
+    with _catalog_lock:
+        product = _new_product(data, product_id)
+        with _catalog_write():
+            _reindex_product(None, product)
+            _publish_product(product)
+        seq = _log('products', product['product_id'], product)
+    _wait_durable(seq)
+    return product
 
 
 def update_product(product_id, updates):
-    with _store_lock:
-        product = next((p for p in _products if p['product_id'] == product_id), None)
+    with _catalog_lock, _stock_locks.for_key(product_id):
+        product = _products.get(product_id)
         if not product:
             return None
+        changes = {}
         for key in ['name', 'description', 'price', 'image_url', 'stock', 'category']:
             if key in updates:
                 if key == 'price':
-                    product[key] = float(updates[key])
+                    changes[key] = float(updates[key])
                 elif key == 'stock':
-                    product[key] = int(updates[key])
+                    changes[key] = int(updates[key])
                 else:
-                    product[key] = updates[key]
-        return product.copy()
+                    changes[key] = _text(updates[key])
+        updated = {**product, **changes}
+        with _catalog_write():
+            _reindex_product(product, updated)
+            if _shared is not None and 'stock' in changes and _shared.has_product(product_id):
+                _shared.set_stock(product_id, changes['stock'])
+            _publish_product(updated)
+        seq = _log('products', product_id, updated)
+    _wait_durable(seq)
+    return updated
 
 
 def delete_product(product_id):
-    with _store_lock:
-        idx = next((i for i, p in enumerate(_products) if p['product_id'] == product_id), None)
-        if idx is None:
+    with _catalog_lock, _stock_locks.for_key(product_id):
+        product = _products.get(product_id)
+        if product is None:
             return False
-        _products.pop(idx)
-        return True
+        with _catalog_write():
+            _reindex_product(product, None)
+            if _columnar_catalog is not None:
+                _columnar_catalog.remove(product_id)
+            del _products[product_id]
+            _bump_catalog_version()
+        seq = _log('products', product_id, None)
+    _wait_durable(seq)
+    return True
 
 
 def create_order(user_id, total_amount):
-    global _next_order_id
-    with _store_lock:
+    with _order_locks.for_key(int(user_id)):
         order = {
-            'order_id': _next_order_id,
+            'order_id': _next_id('orders'),
             'user_id': int(user_id),
             'total_amount': float(total_amount),
             'created_at': _now(),
         }
-        _orders.append(order)
-        _next_order_id += 1
-        return order.copy()
+        _orders[order['order_id']] = order
+        _orders_by_user.setdefault(order['user_id'], []).append(order)
+        seq = _log('orders', order['order_id'], order)
+    _wait_durable(seq)
+    return order
 
 
 def create_order_item(order_id, product_id, quantity, price):
-    global _next_order_item_id
-    with _store_lock:
-        item = {
-            'order_item_id': _next_order_item_id,
-            'order_id': int(order_id),
-            'product_id': int(product_id),
-            'quantity': int(quantity),
-            'price': float(price),
-        }
-        _order_items.append(item)
-        _next_order_item_id += 1
-        return item.copy()
+    # No lock needed: the id comes from an atomic counter and each index
+    # update below is a single atomic dict/list operation.
+    item = {
+        'order_item_id': _next_id('order_items'),
+        'order_id': int(order_id),
+        'product_id': int(product_id),
+        'quantity': int(quantity),
+        'price': float(price),
+    }
+    _order_items[item['order_item_id']] = item
+    _items_by_order.setdefault(item['order_id'], []).append(item)
+    _wait_durable(_log('order_items', item['order_item_id'], item))
+    return item
 
 
 def decrement_product_stock(product_id, quantity):
-    with _store_lock:
-        product = next((p for p in _products if p['product_id'] == product_id), None)
+    with _stock_locks.for_key(product_id):
+        product = _products.get(product_id)
         if not product:
             return None
-        if int(product['stock']) < int(quantity):
-            return False
-        product['stock'] = int(product['stock']) - int(quantity)
-        return True
-
-
-def get_orders_by_user(user_id):
-    user_orders = [o.copy() for o in _orders if o['user_id'] == int(user_id)]
-    user_orders.sort(key=lambda o: o['order_id'], reverse=True)
-    return user_orders
+        if _shared is not None and _shared.has_product(product_id):
+            remaining = _shared.decrement_stock(product_id, int(quantity))
+            if remaining is None:
+                return False
+        else:
+            if int(product['stock']) < int(quantity):
+                return False
+            remaining = int(product['stock']) - int(quantity)
+        product = {**product, 'stock': remaining}
+        # Only touches one entry of the in-stock index (a single atomic
+        # operation), so this doesn't need _catalog_lock or _catalog_seq.
+        if _columnar_catalog is not None:
+            _columnar_catalog.set_stock(product_id, product['stock'])
+        elif product['stock'] <= 0:
+            _in_stock_ids.discard(product_id)
+        _publish_product(product)
+        seq = _log('products', product_id, product)
+    _wait_durable(seq)
+    return True
+
+
+class OrderError(Exception):
+    """Raised by place_order; reason is 'not_found' or 'insufficient_stock'."""
+
+    def __init__(self, reason, product_id):
+        super().__init__(f'{reason}: product {product_id}')
+        self.reason = reason
+        self.product_id = product_id
+
+
+def place_order(user_id, items):
+    """Validate, price, reserve stock for and record a whole order at once.
+
+    items is a list of {'product_id', 'quantity'}. Either every line is
+    reserved and the order plus its items are stored, or nothing changes and
+    OrderError is raised. Returns the order with 'items' attached.
+    """
+    initialize_store()
+    lines = [(int(item['product_id']), int(item['quantity'])) for item in items]
+    quantities = {}
+    for product_id, quantity in lines:
+        quantities[product_id] = quantities.get(product_id, 0) + quantity
+
+    with ExitStack() as stack:
+        for lock in _stock_locks.for_keys(quantities):
+            stack.enter_context(lock)
+        stack.enter_context(_order_locks.for_key(int(user_id)))
+
+        products = {}
+        for product_id, _ in lines:
+            product = _products.get(product_id)
+            if product is None:
+                raise OrderError('not_found', product_id)
+            products[product_id] = product
+
+        shared_ids = [pid for pid in quantities if _shared is not None and _shared.has_product(pid)]
+        for product_id, quantity in quantities.items():
+            if product_id not in shared_ids and products[product_id]['stock'] < quantity:
+                raise OrderError('insufficient_stock', product_id)
+        remaining = {pid: products[pid]['stock'] - quantities[pid] for pid in quantities}
+        if shared_ids:
+            short, reserved = _shared.reserve({pid: quantities[pid] for pid in shared_ids})
+            if short is not None:
+                raise OrderError('insufficient_stock', short)
+            remaining.update(reserved)
+
+        # Everything below only applies already-validated changes.
+        seq = 0
+        for product_id, stock in remaining.items():
+            product = {**products[product_id], 'stock': stock}
+            if _columnar_catalog is not None:
+                _columnar_catalog.set_stock(product_id, stock)
+            elif stock <= 0:
+                _in_stock_ids.discard(product_id)
+            _publish_product(product)
+            products[product_id] = product
+            seq = _log('products', product_id, product)
+
+        total_amount = sum(products[pid]['price'] * quantity for pid, quantity in lines)
+        order = {
+            'order_id': _next_id('orders'),
+            'user_id': int(user_id),
+            'total_amount': float(total_amount),
+            'created_at': _now(),
+        }
+        order_items = []
+        for product_id, quantity in lines:
+            item = {
+                'order_item_id': _next_id('order_items'),
+                'order_id': order['order_id'],
+                'product_id': product_id,
+                'quantity': quantity,
+                'price': products[product_id]['price'],
+            }
+            _order_items[item['order_item_id']] = item
+            order_items.append(item)
+            seq = _log('order_items', item['order_item_id'], item)
+        _items_by_order[order['order_id']] = order_items
+        _orders[order['order_id']] = order
+        _orders_by_user.setdefault(order['user_id'], []).append(order)
+        seq = _log('orders', order['order_id'], order)
+    _wait_durable(seq)
+    return {**order, 'items': order_items[:]}
+
+
+def get_orders_by_user(user_id, limit=None, after_id=None):
+    """A user's orders newest first; with limit/after_id, one keyset page."""
+    # Orders are appended in id order, so newest-first is a plain reversal.
+    orders = _orders_by_user.get(int(user_id), [])
+    if limit is None and after_id is None:
+        return orders[::-1]
+    orders = orders[:]
+    end = len(orders) if after_id is None else _keyset_start(orders, after_id, lambda o: o['order_id'], False)
+    start = 0 if limit is None else max(0, end - limit)
+    return orders[start:end][::-1]
 
 
 def get_order_by_id(order_id):
-    order = next((o for o in _orders if o['order_id'] == int(order_id)), None)
-    return order.copy() if order else None
+    return _orders.get(int(order_id))
 
 
 def get_order_items(order_id):
-    return [i.copy() for i in _order_items if i['order_id'] == int(order_id)]
\ No newline at end of file
+    return _items_by_order.get(int(order_id), [])[:]
+
+
+def get_items_for_orders(order_ids):
+    """{order_id: [items]} for several orders, straight from the order index."""
+    return {int(order_id): _items_by_order.get(int(order_id), [])[:] for order_id in order_ids}
\ No newline at end of file
@@ -0,0 +1,69 @@
+"""Streamed JSON responses for results too large to build in memory.
+
+stream_rows() writes the same {"<key>": [...], "count": n} body jsonify
+would, but row by row from any iterable (for example app.database.fetch_iter),
+so the full list and the full body never exist at once. Clients that send
+Accept: application/x-ndjson get one JSON object per line instead.
+
+Headers are sent before the first row, so an error mid-stream can't change
+the status code; the body is cut short and won't parse.
+"""
+from flask import Response, current_app, request
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+_FLUSH_BYTES = 64 * 1024
+
+
+def wants_ndjson():
+    return request.accept_mimetypes.best_match(['application/json', NDJSON_MIMETYPE]) == NDJSON_MIMETYPE
+
+
+def _buffered(pieces):
+    # Many tiny chunks would mean a write (and with chunked encoding, a
+    # chunk header) per row; send roughly _FLUSH_BYTES at a time instead.
+    buffer = []
+    size = 0
+    for piece in pieces:
+        buffer.append(piece)
+        size += len(piece)
+        if size >= _FLUSH_BYTES:
+            yield ''.join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+def ndjson_lines(rows):
+    """One JSON document per row, newline terminated."""
+    # Resolved now: the generator runs after the view has returned.
+    dumps = current_app.json.dumps
+    return (dumps(row) + '\n' for row in rows)
+
+
+def stream_lines(lines, mimetype, filename=None):
+    """A streamed response of preformatted lines, optionally as a download."""
+    response = Response(_buffered(lines), mimetype=mimetype)
+    if filename:
+        response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def stream_rows(key, rows, extra=None):
+    """A streamed response listing rows under key, plus count and extra fields."""
+    dumps = current_app.json.dumps
+
+    if wants_ndjson():
+        return stream_lines(ndjson_lines(rows), NDJSON_MIMETYPE)
+
+    def json_object():
+        yield '{' + dumps(key) + ':['
+        count = 0
+        for row in rows:
+            yield (',' if count else '') + dumps(row)
+            count += 1
+        yield '],"count":' + str(count)
+        for name, value in (extra or {}).items():
+            yield ',' + dumps(name) + ':' + dumps(value)
+        yield '}'
+    return Response(_buffered(json_object()), mimetype='application/json')
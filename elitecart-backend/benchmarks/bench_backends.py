@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+"""Compare storage backends through the interface the routes use.
+
+Usage: python benchmarks/bench_backends.py [--backends memory,sqlite] [--threads 8]
+
+For each backend: product lookups by id, a filtered keyset page, and
+concurrent checkouts on a few hot products, then a check that no product
+sold more than its stock. The SQLite file goes to a temporary directory.
+MySQL is included only when named and reachable (DB_* settings).
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def make_backend(name, directory):
+    if name == 'sqlite':
+        from app.backends.sqlite import SQLiteBackend
+        return SQLiteBackend(os.path.join(directory, 'bench.db'))
+    from app.backends import create_backend
+    return create_backend(name)
+
+
+def timed(threads, per_thread, work):
+    def worker(index):
+        rng = random.Random(index)
+        for _ in range(per_thread):
+            work(rng)
+
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return threads * per_thread / (time.perf_counter() - start)
+
+
+def run(name, args, directory):
+    from app.backends import OrderError
+    backend = make_backend(name, directory)
+    product_ids = [
+        backend.create_product({
+            'name': f'Bench product {i}', 'description': 'Benchmark product', 'price': 10.0 + i % 50,
+            'image_url': '/images/bench.jpg', 'stock': args.stock, 'category': f'Bench{i % 5}',
+        })
+        for i in range(args.products)
+    ]
+    user = backend.create_user('Bench', f'bench-{name}@example.com', 'x')
+    hot = product_ids[:args.hot]
+
+    reads = timed(args.threads, args.ops, lambda rng: backend.get_product(rng.choice(product_ids)))
+    pages = timed(args.threads, args.ops // 10, lambda rng: backend.list_products(
+        f'Bench{rng.randrange(5)}', 20, 40, True, 21, None))
+
+    def checkout(rng):
+        items = [{'product_id': pid, 'quantity': 1} for pid in rng.sample(hot, 2)]
+        try:
+            backend.place_order(user['user_id'], items)
+        except OrderError:
+            pass
+    orders = timed(args.threads, args.ops // 10, checkout)
+
+    sold = {pid: 0 for pid in hot}
+    for order in backend.get_orders_by_user(user['user_id']):
+        for item in order['items']:
+            sold[item['product_id']] += item['quantity']
+    oversold = sum(
+        max(0, units - args.stock) + (backend.get_product(pid)['stock'] != args.stock - units)
+        for pid, units in sold.items()
+    )
+    print(f'{name:>7}: {reads:9.0f} lookups/s  {pages:8.0f} pages/s  {orders:7.0f} checkouts/s  '
+          f'stock errors {oversold}')
+    return oversold
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--backends', default='memory,sqlite')
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--ops', type=int, default=20000, help='lookups per thread')
+    parser.add_argument('--products', type=int, default=2000)
+    parser.add_argument('--hot', type=int, default=10)
+    parser.add_argument('--stock', type=int, default=300)
+    args = parser.parse_args()
+
+    failed = False
+    with tempfile.TemporaryDirectory() as directory:
+        for name in args.backends.split(','):
+            failed |= bool(run(name.strip(), args, directory))
+    if failed:
+        sys.exit('a backend oversold stock')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+"""Benchmark list_products: dict indexes vs. the columnar catalog.
+
+Usage: python benchmarks/bench_catalog.py [--sizes 10000,100000,1000000]
+
+The dict-index path maintains a sorted price array with insort, so loading
+it is quadratic; it is skipped above --max-indexed products.
+"""
+import argparse
+import importlib
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CATEGORIES = ['Men', 'Women', 'Unisex', 'Kids', 'Shoes', 'Accessories']
+
+QUERIES = [
+    ('category', dict(category='Women')),
+    ('price range', dict(min_price=40, max_price=60)),
+    ('category + price + stock', dict(category='Men', min_price=100, max_price=120, in_stock=True)),
+    ('narrow price', dict(min_price=99.0, max_price=99.5)),
+]
+
+
+def load_store(columnar, size):
+    os.environ['STORE_COLUMNAR_CATALOG'] = '1' if columnar else '0'
+    from app import store
+    store = importlib.reload(store)
+    store.initialize_store()
+    rng = random.Random(42)
+    start = time.perf_counter()
+    for i in range(size):
+        store.create_product({
+            'name': f'Product {i}',
+            'description': 'Benchmark product',
+            'price': round(rng.uniform(1, 300), 2),
+            'image_url': '/images/bench.jpg',
+            'stock': rng.randint(0, 20),
+            'category': rng.choice(CATEGORIES),
+        })
+    return store, time.perf_counter() - start
+
+
+def time_query(store, kwargs, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = store.list_products(**kwargs)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000, len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='10000,100000,1000000')
+    parser.add_argument('--max-indexed', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    from app import catalog
+    engines = [('indexed', False)]
+    if catalog.is_available():
+        engines.append(('columnar', True))
+    else:
+        print('numpy is not installed; benchmarking the dict indexes only')
+
+    for size in [int(s) for s in args.sizes.split(',')]:
+        print(f'\n== {size:,} products ==')
+        for engine, columnar in engines:
+            if not columnar and size > args.max_indexed:
+                print(f'{engine:>9}: skipped (above --max-indexed)')
+                continue
+            store, load_seconds = load_store(columnar, size)
+            print(f'{engine:>9}: load {load_seconds:.2f}s')
+            for label, kwargs in QUERIES:
+                ms, count = time_query(store, kwargs, args.repeat)
+                print(f'{"":>11}{label:<28} {ms:9.2f} ms  ({count:,} rows)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+"""Concurrent checkout contention test for the SQL backends.
+
+Usage: python benchmarks/bench_checkout.py [--backends mysql,sqlite] [--threads 16] [--orders 4000]
+
+Many threads buy multi-line carts, listed in random order, from a few hot
+products whose stock runs out partway through. For MySQL (DB_* settings;
+skipped when unreachable) the checkout runs twice. The first pass uses the
+previous place_order, which read stock without locking rows and then
+decremented it. The second uses the current one, which locks the cart's
+rows with SELECT ... FOR UPDATE in id order first. SQLite runs the current
+one only; it already serializes checkouts with BEGIN IMMEDIATE.
+
+Reports checkouts/s, accepted and rejected carts and storage errors such as
+deadlocks. It then checks every hot product for units sold beyond its stock
+and for stock that doesn't match its order items. Exits non-zero if the
+current place_order oversold anything.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def unlocked_place_order(backend, user_id, items):
+    """MySQLBackend.place_order before row locking: check, then decrement."""
+    from app import queries
+    from app.backends import OrderError, product_ids_query
+    from app.database import transaction
+
+    quantities = {}
+    for item in items:
+        quantities[item['product_id']] = quantities.get(item['product_id'], 0) + item['quantity']
+    with transaction() as tx:
+        query, params = product_ids_query('%s', list(quantities), ('product_id', 'price', 'stock'))
+        products = {row['product_id']: row for row in tx.fetch_all(query, params)}
+        for product_id, quantity in quantities.items():
+            if product_id not in products:
+                raise OrderError('not_found', product_id)
+            if products[product_id]['stock'] < quantity:
+                raise OrderError('insufficient_stock', product_id)
+        total_amount = sum(products[item['product_id']]['price'] * item['quantity'] for item in items)
+        order_id = tx.insert(queries.INSERT_ORDER, (user_id, total_amount))
+        tx.executemany(
+            queries.INSERT_ORDER_ITEM,
+            [(order_id, item['product_id'], item['quantity'], products[item['product_id']]['price'])
+             for item in items],
+        )
+        cases = ' '.join(['WHEN %s THEN %s'] * len(quantities))
+        placeholders = ', '.join(['%s'] * len(quantities))
+        tx.execute(
+            f'UPDATE products SET stock = stock - CASE product_id {cases} END WHERE product_id IN ({placeholders})',
+            [value for pair in quantities.items() for value in pair] + list(quantities),
+        )
+
+
+def locked_place_order(backend, user_id, items):
+    backend.place_order(user_id, items)
+
+
+def make_backend(name, directory):
+    if name == 'sqlite':
+        from app.backends.sqlite import SQLiteBackend
+        return SQLiteBackend(os.path.join(directory, 'checkout.db'))
+    from app.backends import create_backend
+    return create_backend(name)
+
+
+def run(name, checkout, args, directory):
+    from app.backends import STORAGE_ERRORS, OrderError
+    backend = make_backend(name, directory)
+    product_ids = [
+        backend.create_product({
+            'name': f'Hot product {i}', 'description': 'Checkout benchmark product', 'price': 10.0 + i,
+            'image_url': '/images/bench.jpg', 'stock': args.stock, 'category': 'Bench',
+        })
+        for i in range(args.products)
+    ]
+    tag = f'{name}-{checkout.__name__}-{time.time_ns()}'
+    users = [
+        backend.create_user('Bench', f'bench-{tag}-{i}@example.com', 'x')['user_id']
+        for i in range(args.threads)
+    ]
+    accepted = [0] * args.threads
+    rejected = [0] * args.threads
+    errors = [0] * args.threads
+    per_thread = args.orders // args.threads
+
+    def buyer(index):
+        rng = random.Random(index)
+        for _ in range(per_thread):
+            # Lines in random order: a checkout that locked rows in cart
+            # order would deadlock against one holding them the other way.
+            items = [{'product_id': pid, 'quantity': rng.randint(1, 2)}
+                     for pid in rng.sample(product_ids, rng.randint(1, 3))]
+            try:
+                checkout(backend, users[index], items)
+                accepted[index] += 1
+            except OrderError:
+                rejected[index] += 1
+            except STORAGE_ERRORS:
+                errors[index] += 1
+
+    threads = [threading.Thread(target=buyer, args=(i,)) for i in range(args.threads)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    sold = {pid: 0 for pid in product_ids}
+    for user_id in users:
+        for order in backend.get_orders_by_user(user_id):
+            for item in order['items']:
+                sold[item['product_id']] += item['quantity']
+    oversold = sum(max(0, units - args.stock) for units in sold.values())
+    mismatches = sum(1 for pid in product_ids if backend.get_product(pid)['stock'] != args.stock - sold[pid])
+
+    attempts = per_thread * args.threads
+    print(f'{name:>7} {checkout.__name__:>20}: {attempts / elapsed:8.0f} checkouts/s  '
+          f'accepted {sum(accepted):,}  rejected {sum(rejected):,}  errors {sum(errors):,}  '
+          f'oversold units {oversold}  stock/items mismatches {mismatches}')
+    return oversold + mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--backends', default='mysql,sqlite')
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--orders', type=int, default=4000)
+    parser.add_argument('--products', type=int, default=5)
+    parser.add_argument('--stock', type=int, default=500)
+    args = parser.parse_args()
+
+    from app.backends import STORAGE_ERRORS
+
+    failed = False
+    with tempfile.TemporaryDirectory() as directory:
+        for name in args.backends.split(','):
+            name = name.strip()
+            checkouts = [unlocked_place_order, locked_place_order] if name == 'mysql' else [locked_place_order]
+            try:
+                for checkout in checkouts:
+                    result = run(name, checkout, args, directory)
+                    failed |= checkout is locked_place_order and bool(result)
+            except STORAGE_ERRORS as err:
+                print(f'{name:>7}: skipped ({err})')
+    if failed:
+        sys.exit('place_order oversold stock')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+"""Benchmark JSON encoding and compression of catalog and order responses.
+
+Usage: python benchmarks/bench_json.py [--products 2000] [--orders 200] [--seconds 2]
+
+Compares, through the Flask test client:
+
+    before  Flask's default JSON provider, no compression
+    after   app.json_provider (orjson if installed) and app.compression,
+            with the client sending Accept-Encoding: gzip (and br if brotli
+            is installed)
+
+for GET /api/products?limit=100, the streamed full listing and GET
+/api/orders/user/<id>. Rows are shaped like MySQL's (Decimal prices,
+datetime timestamps), since those are the slow path of the default encoder.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CATEGORIES = ['Men', 'Women', 'Unisex', 'Kids', 'Shoes', 'Accessories']
+
+
+def _sql_shaped(row):
+    row = dict(row)
+    for key in ('price', 'total_amount'):
+        if key in row:
+            row[key] = Decimal(str(row[key])).quantize(Decimal('0.01'))
+    if isinstance(row.get('created_at'), str):
+        row['created_at'] = datetime.fromisoformat(row['created_at'].rstrip('Z')).replace(tzinfo=None)
+    return row
+
+
+def sql_shaped_backend():
+    """The memory backend, returning rows as the MySQL driver would."""
+    from app.backends.memory import MemoryBackend
+
+    class SQLShapedBackend(MemoryBackend):
+        def list_products(self, *args, **kwargs):
+            return [_sql_shaped(row) for row in super().list_products(*args, **kwargs)]
+
+        def get_orders_by_user(self, user_id, limit=None, after_id=None):
+            return [
+                {**_sql_shaped(order), 'items': [_sql_shaped(item) for item in order['items']]}
+                for order in super().get_orders_by_user(user_id, limit, after_id)
+            ]
+
+    return SQLShapedBackend()
+
+
+def seed(products, orders):
+    from app import store
+    rng = random.Random(42)
+    store.initialize_store()
+    store.create_products([
+        {
+            'name': f'Product {i}',
+            'description': 'A benchmark product with a description of typical length for the catalog.',
+            'price': round(rng.uniform(1, 300), 2),
+            'image_url': f'/images/product-{i}.jpg',
+            'stock': 1000000,
+            'category': rng.choice(CATEGORIES),
+        }
+        for i in range(products)
+    ])
+    user = store.create_user('Bench', f'bench-{time.time_ns()}@example.com', 'x')
+    product_ids = [product['product_id'] for product in store.list_products()]
+    for _ in range(orders):
+        items = [{'product_id': pid, 'quantity': rng.randint(1, 3)} for pid in rng.sample(product_ids, 3)]
+        store.place_order(user['user_id'], items)
+    return user['user_id']
+
+
+def make_app(after):
+    from flask.json.provider import DefaultJSONProvider
+    from app.main import create_app
+
+    os.environ['COMPRESSION'] = 'on' if after else 'off'
+    app = create_app(sql_shaped_backend())
+    if not after:
+        app.json = DefaultJSONProvider(app)
+    return app
+
+
+def measure(client, url, headers, seconds):
+    count = 0
+    wire_bytes = 0
+    start = time.perf_counter()
+    deadline = start + seconds
+    while time.perf_counter() < deadline:
+        response = client.get(url, headers=headers)
+        assert response.status_code == 200, (url, response.status_code)
+        wire_bytes = len(response.get_data())
+        count += 1
+    return count / (time.perf_counter() - start), wire_bytes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', type=int, default=2000)
+    parser.add_argument('--orders', type=int, default=200)
+    parser.add_argument('--seconds', type=float, default=2.0)
+    args = parser.parse_args()
+
+    os.environ['USE_IN_MEMORY_STORE'] = '1'
+    from flask_jwt_extended import create_access_token
+    from app import compression, json_provider
+
+    user_id = seed(args.products, args.orders)
+    encodings = 'br, gzip' if compression.brotli is not None else 'gzip'
+    print(f'{args.products} products, {args.orders} orders; '
+          f'encoder: {"orjson" if json_provider.is_available() else "stdlib"}; Accept-Encoding: {encodings}')
+
+    urls = [
+        ('products page', '/api/products?limit=100'),
+        ('products (all, streamed)', '/api/products'),
+        ('order history', f'/api/orders/user/{user_id}'),
+    ]
+    results = {}
+    for label, after in (('before', False), ('after', True)):
+        app = make_app(after)
+        with app.app_context():
+            token = create_access_token(identity=str(user_id))
+        headers = {'Authorization': f'Bearer {token}'}
+        if after:
+            headers['Accept-Encoding'] = encodings
+        client = app.test_client()
+        for name, url in urls:
+            results[name, label] = measure(client, url, headers, args.seconds)
+
+    print(f'{"endpoint":<26} {"before req/s":>12} {"after req/s":>12} {"speedup":>8} '
+          f'{"before KB":>10} {"after KB":>10}')
+    for name, _ in urls:
+        (before_rate, before_bytes), (after_rate, after_bytes) = results[name, 'before'], results[name, 'after']
+        print(f'{name:<26} {before_rate:>12.0f} {after_rate:>12.0f} {after_rate / before_rate:>7.2f}x '
+              f'{before_bytes / 1024:>10.1f} {after_bytes / 1024:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
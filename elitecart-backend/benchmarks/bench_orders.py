@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+"""Concurrent checkout stress test for the in-memory store.
+
+Usage: python benchmarks/bench_orders.py [--threads 8] [--orders 20000]
+
+Many threads buy from a small set of hot products with limited stock, once
+through store.place_order and once through the old route's sequence (check
+stock, create_order, create_order_item, decrement_product_stock). Reports
+throughput and verifies that no product sold more units than it had.
+"""
+import argparse
+import importlib
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def legacy_checkout(store, user_id, items):
+    """The order route before place_order: 2N+1 separate store calls."""
+    total = 0
+    for item in items:
+        product = store.get_product_by_id(item['product_id'])
+        if product is None or product['stock'] < item['quantity']:
+            return False
+        total += product['price'] * item['quantity']
+    order = store.create_order(user_id, total)
+    for item in items:
+        product = store.get_product_by_id(item['product_id'])
+        store.create_order_item(order['order_id'], item['product_id'], item['quantity'], product['price'])
+        store.decrement_product_stock(item['product_id'], item['quantity'])
+    return True
+
+
+def atomic_checkout(store, user_id, items):
+    try:
+        store.place_order(user_id, items)
+        return True
+    except store.OrderError:
+        return False
+
+
+def run(checkout, args):
+    from app import store
+    store = importlib.reload(store)
+    store.initialize_store()
+    product_ids = [
+        store.create_product({
+            'name': f'Hot product {i}',
+            'description': 'Benchmark product',
+            'price': 10.0 + i,
+            'image_url': '/images/bench.jpg',
+            'stock': args.stock,
+            'category': 'Bench',
+        })['product_id']
+        for i in range(args.products)
+    ]
+    accepted = [0] * args.threads
+    per_thread = args.orders // args.threads
+
+    def buyer(index):
+        rng = random.Random(index)
+        for _ in range(per_thread):
+            lines = rng.randint(1, 3)
+            items = [{'product_id': pid, 'quantity': rng.randint(1, 2)} for pid in rng.sample(product_ids, lines)]
+            if checkout(store, index + 1, items):
+                accepted[index] += 1
+
+    threads = [threading.Thread(target=buyer, args=(i,)) for i in range(args.threads)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    sold = {pid: 0 for pid in product_ids}
+    for item in store._order_items.values():
+        if item['product_id'] in sold:
+            sold[item['product_id']] += item['quantity']
+    oversold = sum(max(0, units - args.stock) for units in sold.values())
+    stock_mismatch = sum(
+        1 for pid in product_ids
+        if store.get_product_by_id(pid)['stock'] != args.stock - min(sold[pid], args.stock)
+    )
+    attempts = per_thread * args.threads
+    print(f'{checkout.__name__:>16}: {attempts / elapsed:9.0f} checkouts/s  '
+          f'accepted {sum(accepted):,}/{attempts:,}  oversold units {oversold}  '
+          f'stock/items mismatches {stock_mismatch}')
+    return oversold
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--orders', type=int, default=20000)
+    parser.add_argument('--products', type=int, default=20)
+    parser.add_argument('--stock', type=int, default=2500)
+    args = parser.parse_args()
+
+    # Switch threads often so check-then-act races actually interleave.
+    sys.setswitchinterval(1e-6)
+    run(legacy_checkout, args)
+    oversold = run(atomic_checkout, args)
+    if oversold:
+        sys.exit('place_order oversold stock')
+
+
+if __name__ == '__main__':
+    main()
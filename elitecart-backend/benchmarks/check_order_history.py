@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+"""Check that order history costs a constant number of queries.
+
+Usage: python benchmarks/check_order_history.py [--orders 1,10,200]
+
+Calls GET /api/orders/user/<id> in SQL mode against a fake database that
+counts statements instead of running them (no MySQL needed), then times the
+same endpoint in memory mode. Exits nonzero if the SQL query count grows
+with the number of orders.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class CountingDatabase:
+    """Stands in for app.database.fetch_all with n orders of three items each."""
+
+    def __init__(self, order_count):
+        self.order_count = order_count
+        self.queries = 0
+
+    def fetch_all(self, query, params=None, primary=False, sticky_key=None):
+        self.queries += 1
+        if 'FROM order_items' in query:
+            return [
+                {'order_item_id': order_id * 3 + line, 'order_id': order_id, 'product_id': line + 1,
+                 'quantity': 1, 'price': 10.0}
+                for order_id in params for line in range(3)
+            ]
+        return [
+            {'order_id': order_id, 'user_id': 1, 'total_amount': 30.0, 'status': 'pending'}
+            for order_id in range(self.order_count, 0, -1)
+        ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--orders', default='1,10,200')
+    args = parser.parse_args()
+    counts = [int(n) for n in args.orders.split(',')]
+
+    from flask_jwt_extended import create_access_token
+    from app import store
+    from app.backends import mysql as mysql_backend
+    from app.main import create_app
+
+    app = create_app('mysql')
+    with app.app_context():
+        headers = {'Authorization': f'Bearer {create_access_token(identity="1")}'}
+    client = app.test_client()
+
+    query_counts = []
+    for n in counts:
+        fake = CountingDatabase(n)
+        mysql_backend.fetch_all = fake.fetch_all
+        response = client.get('/api/orders/user/1', headers=headers)
+        assert response.status_code == 200 and response.get_json()['count'] == n
+        query_counts.append(fake.queries)
+        print(f'SQL    {n:>6} orders: {fake.queries} queries')
+
+    app = create_app('memory')
+    client = app.test_client()
+
+    product_id = store.create_product({
+        'name': 'History product', 'description': 'Benchmark product', 'price': 10.0,
+        'image_url': '/images/bench.jpg', 'stock': 3 * sum(counts), 'category': 'Bench',
+    })['product_id']
+    for n in counts:
+        user_id = store.create_user(f'Bench {n}', f'bench{n}@example.com', 'x')['user_id']
+        for _ in range(n):
+            store.place_order(user_id, [{'product_id': product_id, 'quantity': 1}] * 2)
+        with app.app_context():
+            user_headers = {'Authorization': f'Bearer {create_access_token(identity=str(user_id))}'}
+        start = time.perf_counter()
+        response = client.get(f'/api/orders/user/{user_id}', headers=user_headers)
+        elapsed = time.perf_counter() - start
+        assert response.status_code == 200 and response.get_json()['count'] == n
+        print(f'memory {n:>6} orders: {elapsed * 1000:.2f} ms')
+
+    if len(set(query_counts)) != 1:
+        sys.exit(f'order history query count grows with orders: {query_counts}')
+
+
+if __name__ == '__main__':
+    main()
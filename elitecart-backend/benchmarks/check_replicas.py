@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+"""Check read-replica routing against two local MySQL instances.
+
+Usage:
+    DB_PORT=3306 DB_REPLICAS=127.0.0.1:3307 python benchmarks/check_replicas.py
+
+Start the primary on 3306 and the second instance on 3307 (any MySQL will
+do; real replication isn't needed to check routing), for example:
+
+    docker run -d -p 3306:3306 -e MYSQL_ALLOW_EMPTY_PASSWORD=1 mysql:8
+    docker run -d -p 3307:3306 -e MYSQL_ALLOW_EMPTY_PASSWORD=1 mysql:8
+
+Verifies that plain reads go to the replica, primary=True and recently
+stuck keys go to the primary, and that reads fail over from an unreachable
+replica to the healthy one: a dead replica (127.0.0.1:1) is listed ahead of
+the real one, every read must still land on the real one, and only the dead
+one may be reported unhealthy.
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SERVER = 'SELECT @@port AS port, @@server_uuid AS server'
+
+
+def main():
+    os.environ.setdefault('DB_NAME', 'mysql')
+    os.environ['DB_READ_YOUR_WRITES_SECONDS'] = '1'
+    if not os.getenv('DB_REPLICAS'):
+        sys.exit('set DB_REPLICAS to the second instance, e.g. 127.0.0.1:3307')
+    from app import database
+
+    primary = database.fetch_one(SERVER, primary=True)['server']
+    replica = database.fetch_one(SERVER)['server']
+    print(f'primary {primary}, replica {replica}')
+    assert replica != primary, 'plain read was not routed to the replica'
+
+    database.stick_to_primary(('user', 1))
+    assert database.fetch_one(SERVER, sticky_key=('user', 1))['server'] == primary
+    assert database.fetch_one(SERVER, sticky_key=('user', 2))['server'] == replica
+    time.sleep(1.1)
+    assert database.fetch_one(SERVER, sticky_key=('user', 1))['server'] == replica
+    print('read-your-writes window: ok')
+
+    database.Database.close_connection()
+    os.environ['DB_REPLICAS'] = '127.0.0.1:1,' + os.environ['DB_REPLICAS']
+    os.environ['DB_POOL_TIMEOUT'] = '2'
+    servers = {database.fetch_one(SERVER)['server'] for _ in range(4)}
+    assert servers == {replica}, servers
+    dead = [r for r in database.replica_stats() if not r['healthy']]
+    assert [r['replica'] for r in dead] == ['127.0.0.1:1'], dead
+    print('failover past a dead replica: ok')
+
+
+if __name__ == '__main__':
+    main()
@@ -42,10 +42,26 @@ CREATE TABLE IF NOT EXISTS order_items (
     FOREIGN KEY (order_id) REFERENCES orders(order_id) ON DELETE CASCADE,
     FOREIGN KEY (product_id) REFERENCES products(product_id) ON DELETE CASCADE
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+-- One row; the app bumps it in the same transaction as every product or stock change.
+-- One row; the app bumps it after every committed product or stock change.
+-- Its version and time validate cached catalog responses (ETag and
+-- Last-Modified on GET /api/products).
+CREATE TABLE IF NOT EXISTS catalog_version (
+    id TINYINT PRIMARY KEY,
+    version BIGINT UNSIGNED NOT NULL,
+    modified_at TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6)
+) ENGINE=InnoDB;
+
+INSERT IGNORE INTO catalog_version (id, version) VALUES (1, 0);
 
 -- Create Indexes
 CREATE INDEX idx_user_email ON users(email);
-CREATE INDEX idx_product_category ON products(category);
+-- (category, price) serves category-only and category + price range filters
+-- in GET /api/products; price-only ranges use idx_product_price.
+CREATE INDEX idx_product_category_price ON products(category, price);
+CREATE INDEX idx_product_price ON products(price);
+-- Backs GET /api/products/search (MATCH ... AGAINST in boolean mode).
+CREATE FULLTEXT INDEX idx_product_search ON products(name, description);
 CREATE INDEX idx_order_user ON orders(user_id);
 CREATE INDEX idx_order_item_order ON order_items(order_id);
 CREATE INDEX idx_order_item_product ON order_items(product_id);